@@ -0,0 +1,191 @@
+# admin_notifier.py
+import asyncio
+import logging
+from enum import Enum
+from typing import NamedTuple
+
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramNetworkError, TelegramServerError
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config.bot_instance import bot
+from config.config import ADMIN_IDS, ADMIN_NOTIFY_WINDOW, ADMIN_NOTIFY_RETRIES, ADMIN_NOTIFY_MAX_ATTEMPTS, ADMIN_DIGEST_MAX_ITEMS
+from database import async_session, set_admin_notified, get_unnotified_questions
+from outbound import Lane, lane
+from question_queue import user_display_name
+from screens import Screen
+
+
+logger = logging.getLogger(__name__)
+
+# Длина текста вопроса в уведомлении и в строке сводки (лимит сообщения Telegram — 4096)
+QUESTION_TEXT_LIMIT = 3500
+DIGEST_TEXT_LIMIT = 200
+
+
+class PendingQuestion(NamedTuple):
+    question_id: int
+    user_id: int
+    user_name: str
+    text: str
+    attempts: int = 0  # Окон, в которые уведомление уже не удалось доставить
+
+
+# Итог отправки одному администратору
+class Delivery(Enum):
+    SENT = "sent"
+    FAILED = "failed"  # Сетевая ошибка: имеет смысл повторить позже
+    REJECTED = "rejected"  # Бот заблокирован или запрос отклонён: повтор не поможет
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = text or ""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+# Уведомления администраторам о вопросах пользователей.
+# Первый вопрос уходит сразу, вопросы за следующие window секунд собираются в одну сводку,
+# так при наплыве вопросов каждый администратор получает не больше сообщения в окно.
+# Сообщения получают все ADMIN_IDS; после доставки хотя бы одному вопросы отмечаются
+# admin_notified, а недоставленные при старте берутся из базы повторно (start).
+# Недоставленное повторяется не больше max_attempts окон и не повторяется вовсе,
+# если все администраторы отклонили сообщение окончательно.
+class AdminNotifier:
+    def __init__(
+        self,
+        bot,
+        admin_ids=ADMIN_IDS,
+        session_pool=async_session,
+        window: float = ADMIN_NOTIFY_WINDOW,
+        max_retries: int = ADMIN_NOTIFY_RETRIES,
+        max_attempts: int = ADMIN_NOTIFY_MAX_ATTEMPTS,
+        digest_max_items: int = ADMIN_DIGEST_MAX_ITEMS,
+    ):
+        self.bot = bot
+        self.admin_ids = admin_ids
+        self.session_pool = session_pool
+        self.window = window
+        self.max_retries = max_retries
+        self.max_attempts = max_attempts
+        self.digest_max_items = digest_max_items
+        self._pending = []  # PendingQuestion
+        self._last_sent = None  # loop.time() последней отправки
+        self._task = None
+
+    # Поставить вопрос в очередь уведомлений (без ожидания отправки)
+    def notify(self, question_id: int, user_id: int, user_name: str, text: str):
+        self._pending.append(PendingQuestion(question_id, user_id, user_name, text))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            if self._last_sent is not None:
+                delay = self._last_sent + self.window - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            items, self._pending = self._pending, []
+            self._last_sent = loop.time()
+            try:
+                await self._deliver(items)
+            except asyncio.CancelledError:
+                # Остановка посреди отправки: stop() отправит эти вопросы ещё раз
+                self._pending[:0] = items
+                raise
+
+    def _render(self, items) -> Screen:
+        if len(items) == 1:
+            item = items[0]
+            return Screen(
+                f"💬 Новый вопрос от пользователя {item.user_name} (ID: {item.user_id}, Question ID: {item.question_id}):\n\n"
+                f"{_shorten(item.text, QUESTION_TEXT_LIMIT)}",
+                InlineKeyboardMarkup(inline_keyboard=[
+                    [InlineKeyboardButton(text="Ответить", callback_data=f"answer_{item.question_id}")]
+                ]),
+            )
+
+        shown = items[:self.digest_max_items]
+        lines = [f"💬 Новые вопросы ({len(items)}):\n"]
+        keyboard = []
+        for item in shown:
+            lines.append(f"👤 {item.user_name} (ID: {item.user_id}, Question ID: {item.question_id}): {_shorten(item.text, DIGEST_TEXT_LIMIT)}")
+            keyboard.append([InlineKeyboardButton(text=f"Ответить {item.user_name}", callback_data=f"answer_{item.question_id}")])
+        if len(items) > len(shown):
+            lines.append(f"\n…и ещё {len(items) - len(shown)}, весь список — /questions")
+        return Screen("\n".join(lines), InlineKeyboardMarkup(inline_keyboard=keyboard))
+
+    # Отправка одному администратору с повтором при сетевых ошибках
+    # (RetryAfter повторяет сам outbound_scheduler)
+    async def _send(self, admin_id: int, screen: Screen) -> Delivery:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with lane(Lane.NOTIFY):
+                    await self.bot.send_message(chat_id=admin_id, text=screen.text, reply_markup=screen.reply_markup, parse_mode=None)
+                return Delivery.SENT
+            except TelegramForbiddenError:
+                logger.warning(f"Администратор {admin_id} заблокировал бота, уведомление не доставлено")
+                return Delivery.REJECTED
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+                    return Delivery.FAILED
+                await asyncio.sleep(2 ** attempt)
+            except TelegramAPIError as e:
+                logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+                return Delivery.REJECTED
+        return Delivery.FAILED
+
+    async def _deliver(self, items):
+        screen = self._render(items)
+        results = await asyncio.gather(*(self._send(admin_id, screen) for admin_id in self.admin_ids))
+        sent = results.count(Delivery.SENT)
+        if not sent:
+            self._requeue(items, retryable=Delivery.FAILED in results)
+            return
+
+        try:
+            async with self.session_pool() as db:
+                await set_admin_notified(db, [item.question_id for item in items], list({item.user_id for item in items}))
+        except Exception as e:
+            logger.error(f"Не удалось сохранить admin_notified: {e}")
+        logger.info(f"Уведомление о вопросах ({len(items)} шт.) доставлено администраторам: {sent} из {len(results)}")
+
+    # Никому не доставлено: повторим в следующем окне вместе с новыми вопросами, пока не исчерпан лимит.
+    # Отброшенные вопросы остаются в базе без admin_notified и уйдут после перезапуска (start)
+    def _requeue(self, items, retryable: bool):
+        retry, dropped = [], []
+        for item in items:
+            if retryable and item.attempts + 1 < self.max_attempts:
+                retry.append(item._replace(attempts=item.attempts + 1))
+            else:
+                dropped.append(item.question_id)
+        self._pending[:0] = retry
+        if dropped:
+            reason = "попытки исчерпаны" if retryable else "все администраторы отклонили сообщение"
+            logger.error(f"Уведомление о вопросах {dropped} не доставлено ({reason}), повтор после перезапуска")
+
+    # Вопросы, уведомления о которых не были доставлены до остановки бота (вызывается при старте диспетчера)
+    async def start(self):
+        async with self.session_pool() as db:
+            rows = await get_unnotified_questions(db)
+        for question_id, user_id, text, first_name, last_name, username in rows:
+            self.notify(question_id, user_id, user_display_name(user_id, first_name, last_name, username), text)
+        if rows:
+            logger.info(f"Повторное уведомление администраторов о {len(rows)} вопросах")
+
+    # Остановка: накопленные вопросы отправляются сразу, не дожидаясь окна
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pending:
+            items, self._pending = self._pending, []
+            await self._deliver(items)
+
+
+# Общий экземпляр уведомлений администраторам
+admin_notifier = AdminNotifier(bot)
@@ -1,31 +1,27 @@
 # admin_panel.py
+import os
 import logging
+from datetime import datetime
 from aiogram import Router, F, types
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
-from aiogram.types import CallbackQuery, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config.bot_instance import bot
-from database import get_db, get_bot_statistics, get_user_info_by_username
-from config.config import ADMIN_IDS
+from database import engine, async_session, get_bot_statistics, rebuild_bot_counters, get_user_info_by_username, count_recipients, get_quiz_answer_stats
+from db_pool import pool_status
+from config.config import ADMIN_IDS, EXPORT_MAX_FILE_SIZE
+from broadcast import broadcast_engine, SEGMENTS
+from answer_buffer import answer_buffer
+from quiz_engine import quiz
+from funnel import funnel_report
+from user_export import export_users, export_lock, parse_export_args
 
 
-# Настройка логирования
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),  # Логи в файл
-        logging.StreamHandler()  # Логи в консоль
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
@@ -35,6 +31,8 @@ router = Router()
 # Создаем состояние ожидания ввода юзернейма
 class AdminStates(StatesGroup):
     waiting_for_username = State()
+    waiting_for_broadcast_text = State()
+    confirming_broadcast = State()
 
 
 
@@ -72,16 +70,20 @@ async def admin_message(message: Message):
 
 # Функция получения общей статистики по боту
 @router.callback_query(lambda callback_query: callback_query.data == "admin_stats")
-async def admin_stats(callback_query: CallbackQuery):
+async def admin_stats(callback_query: CallbackQuery, db: AsyncSession):
     # Проверка, что администратор нажал кнопку
     if callback_query.from_user.id not in ADMIN_IDS:
         await callback_query.answer("🚫 У вас нет прав для доступа.")
         return
 
-    # Подключаем базу данных
-    async for db in get_db():
-        # Получаем статистику из базы данных
-        stats = await get_bot_statistics(db)
+    await send_stats(callback_query, db)
+    await callback_query.answer()
+
+
+# Отправка экрана статистики вместо текущего сообщения
+async def send_stats(callback_query: CallbackQuery, db: AsyncSession):
+    # Получаем статистику из счётчиков (без подсчёта по всей таблице пользователей)
+    stats = await get_bot_statistics(db)
 
     # Формируем текст для отправки админу
     text = (
@@ -92,8 +94,12 @@ async def admin_stats(callback_query: CallbackQuery):
         f"4️⃣ Скачали гайд: {stats['guide_downloaded']}"
     )
 
-    # Создаем клавиатуру с кнопкой "Назад"
+    # Создаем клавиатуру с кнопками "Пересчитать" и "Назад"
     back_button = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Пересчитать", callback_data="admin_stats_rebuild")],
+        [InlineKeyboardButton(text="📋 Ответы на тест", callback_data="admin_quiz_answers")],
+        [InlineKeyboardButton(text="📈 Воронка и когорты", callback_data="admin_funnel")],
+        [InlineKeyboardButton(text="🗄 Пул соединений БД", callback_data="admin_db_pool")],
         [InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_admin_menu")]
     ])
     
@@ -102,17 +108,134 @@ async def admin_stats(callback_query: CallbackQuery):
     
     # Отправляем статистику админу
     await callback_query.message.answer(text, reply_markup=back_button)
+
+
+# Функция проверки и пересборки счётчиков статистики по таблице пользователей
+@router.callback_query(lambda callback_query: callback_query.data == "admin_stats_rebuild")
+async def admin_stats_rebuild(callback_query: CallbackQuery, db: AsyncSession):
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    before, actual = await rebuild_bot_counters(db)
+    drift = {name: actual[name] - before[name] for name in actual if actual[name] != before[name]}
+
+    # Показываем обновлённую статистику
+    await send_stats(callback_query, db)
+
+    if drift:
+        logger.warning(f"Счётчики статистики расходились с таблицей users: {drift}")
+        await callback_query.answer("Счётчики пересчитаны, найдены расхождения.", show_alert=True)
+    else:
+        await callback_query.answer("Счётчики совпадают с таблицей пользователей.")
+
+
+# Сводка по ответам на тест: сколько пользователей дошло до каждого вопроса и как распределились ответы
+@router.callback_query(F.data == "admin_quiz_answers")
+async def admin_quiz_answers(callback_query: CallbackQuery, db: AsyncSession):
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    # Свежие ответы из буфера тоже должны попасть в сводку
+    await answer_buffer.flush()
+    stats = await get_quiz_answer_stats(db, quiz.version)
+
+    steps = list(quiz.steps.values())
+    started = stats.get(0, {}).get("users", 0)
+    finished = stats.get(len(steps) - 1, {}).get("users", 0)
+    lines = [
+        f"📋 Ответы на тест (версия {quiz.version})\n",
+        f"Начали тест: {started}, завершили: {finished}"
+        + (f" ({finished * 100 // started}%)" if started else ""),
+    ]
+
+    previous = None
+    for step in steps:
+        question = stats.get(step.index, {"users": 0, "options": {}})
+        users, options = question["users"], question["options"]
+        header = f"\nВопрос {step.index + 1}: ответили {users}"
+        if previous:
+            header += f", отвал {(previous - users) * 100 // previous}%"
+        lines.append(header)
+
+        total = sum(options.values())
+        codes = {number: code for code, (number, _) in step.options.items()}
+        lines.append("   " + " · ".join(
+            f"{codes.get(number, number)} — {options.get(number, 0)} ({options.get(number, 0) * 100 // total if total else 0}%)"
+            for number in sorted(codes)
+        ))
+        previous = users
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_stats")]
+    ])
+
+    await callback_query.message.delete()
+    await callback_query.message.answer("\n".join(lines), reply_markup=keyboard, parse_mode=None)
+    await callback_query.answer()
+
+
+# Воронка по неделям регистрации и языкам (из сводки funnel_daily, с кэшем)
+@router.callback_query(F.data == "admin_funnel")
+async def admin_funnel(callback_query: CallbackQuery, db: AsyncSession):
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    text = await funnel_report.get(db)
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_stats")]
+    ])
+
+    await callback_query.message.delete()
+    await callback_query.message.answer(text, reply_markup=keyboard, parse_mode=None)
+    await callback_query.answer()
+
+
+# Состояние пула соединений: занято сейчас, ожидание соединения, выходы за pool_size
+@router.callback_query(F.data == "admin_db_pool")
+async def admin_db_pool(callback_query: CallbackQuery):
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    status = pool_status(engine)
+    if "checkouts" in status:
+        histogram = "\n".join(f"   {bucket} мс: {count}" for bucket, count in status["wait_histogram_ms"].items() if count)
+        text = (
+            f"🗄 Пул соединений БД\n\n"
+            f"Размер: {status['size']} + до {status['max_overflow']} временных\n"
+            f"Занято сейчас: {status['checked_out']} (сверх размера: {status['overflow']})\n"
+            f"Выдано соединений: {status['checkouts']} (из них с подключением к базе: {status['connects']})\n"
+            f"Ожидание: среднее {status['wait_avg_ms']} мс, максимум {status['wait_max_ms']} мс\n"
+            f"{histogram}\n"
+            f"Выходов за размер пула: {status['overflow_events']}, таймаутов: {status['timeouts']}"
+        )
+    else:
+        text = f"🗄 Пул соединений БД: {status['pool']} (метрики не собираются)\n{status['status']}"
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_stats")]
+    ])
+
+    await callback_query.message.delete()
+    await callback_query.message.answer(text, reply_markup=keyboard, parse_mode=None)
     await callback_query.answer()
 
 
 # Функция для обработки нажатия кнопки "Назад"
 @router.callback_query(lambda callback_query: callback_query.data == "back_to_admin_menu")
-async def back_to_admin_menu(callback_query: CallbackQuery):
+async def back_to_admin_menu(callback_query: CallbackQuery, state: FSMContext):
     # Проверка, что администратор нажал кнопку
     if callback_query.from_user.id not in ADMIN_IDS:
         await callback_query.answer("🚫 У вас нет прав для доступа.")
         return
 
+    # Сбрасываем незавершённый ввод (например, отменённую рассылку)
+    await state.clear()
+
     text = (
         "Добро пожаловать в административную панель бота! 🙌\n\n"
         "Вы можете выбрать одну из следующих опций:\n"
@@ -161,7 +284,7 @@ async def admin_user_info(callback_query: CallbackQuery, state: FSMContext):
 
 # Обработчик, который ждет ввода юзернейма и возвращает информацию
 @router.message(AdminStates.waiting_for_username)
-async def process_username_input(message: Message, state: FSMContext):
+async def process_username_input(message: Message, state: FSMContext, db: AsyncSession):
     user_id = message.from_user.id
 
     # Проверка, что администратор прислал сообщение
@@ -173,9 +296,8 @@ async def process_username_input(message: Message, state: FSMContext):
     if username.startswith('@'):
         username = username[1:]
 
-    # Подключаем базу данных и получаем информацию о пользователе
-    async for db in get_db():
-        user_info = await get_user_info_by_username(db, username)
+    # Получаем информацию о пользователе
+    user_info = await get_user_info_by_username(db, username)
 
     if user_info:
         # Формируем текст с информацией о пользователе
@@ -213,3 +335,141 @@ async def process_username_input(message: Message, state: FSMContext):
     await state.clear()
 
 
+# === Рассылка ===
+
+# Обработчик нажатия на кнопку "Рассылка": выбор сегмента получателей
+@router.callback_query(lambda callback_query: callback_query.data == "admin_broadcast")
+async def admin_broadcast(callback_query: CallbackQuery, state: FSMContext):
+    # Проверка, что администратор нажал кнопку
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    await state.clear()
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=title, callback_data=f"broadcast_segment_{code}")]
+        for code, (title, _) in SEGMENTS.items()
+    ] + [[InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_admin_menu")]])
+
+    # Удаляем старое сообщение и отправляем новое
+    await callback_query.message.delete()  # Удаляем старое сообщение
+
+    await callback_query.message.answer("📨 Выберите, кому отправить рассылку:", reply_markup=keyboard)
+    await callback_query.answer()
+
+
+# Обработчик выбора сегмента: запрашиваем текст рассылки
+@router.callback_query(F.data.startswith("broadcast_segment_"))
+async def admin_broadcast_segment(callback_query: CallbackQuery, state: FSMContext):
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    segment = callback_query.data[len("broadcast_segment_"):]
+    if segment not in SEGMENTS:
+        await callback_query.answer("Неизвестный сегмент.", show_alert=True)
+        return
+
+    await state.set_state(AdminStates.waiting_for_broadcast_text)
+    await state.update_data(broadcast_segment=segment)
+
+    await callback_query.message.delete()  # Удаляем старое сообщение
+    await callback_query.message.answer(
+        f"Сегмент: {SEGMENTS[segment][0]}\n\nОтправьте текст рассылки одним сообщением (форматирование сохранится)."
+    )
+    await callback_query.answer()
+
+
+# Обработчик текста рассылки: показываем число получателей и просим подтверждение
+@router.message(AdminStates.waiting_for_broadcast_text)
+async def admin_broadcast_text(message: Message, state: FSMContext, db: AsyncSession):
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    if not message.text:
+        await message.answer("Рассылка поддерживает только текст. Отправьте текст сообщения.")
+        return
+
+    data = await state.get_data()
+    segment = data.get("broadcast_segment", "all")
+    recipients = await count_recipients(db, SEGMENTS[segment][1])
+
+    await state.update_data(broadcast_text=message.html_text)
+    await state.set_state(AdminStates.confirming_broadcast)
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Отправить", callback_data="broadcast_confirm")],
+        [InlineKeyboardButton(text="❌ Отмена", callback_data="back_to_admin_menu")]
+    ])
+    await message.answer(
+        f"Сегмент: {SEGMENTS[segment][0]}\nПолучателей: {recipients}\n\nОтправить рассылку?",
+        reply_markup=keyboard
+    )
+
+
+# Обработчик подтверждения: запускаем рассылку в фоне
+@router.callback_query(F.data == "broadcast_confirm", AdminStates.confirming_broadcast)
+async def admin_broadcast_confirm(callback_query: CallbackQuery, state: FSMContext):
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    data = await state.get_data()
+    await state.clear()
+
+    segment = data.get("broadcast_segment", "all")
+    broadcast_id = await broadcast_engine.start(
+        data["broadcast_text"], SEGMENTS[segment][1], callback_query.from_user.id
+    )
+    logger.info(f"Администратор {callback_query.from_user.id} запустил рассылку {broadcast_id} ({segment})")
+
+    back_button = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_admin_menu")]
+    ])
+    await callback_query.message.delete()  # Удаляем старое сообщение
+    await callback_query.message.answer(
+        f"🚀 Рассылка #{broadcast_id} запущена. Отчёт придёт по завершении.", reply_markup=back_button
+    )
+    await callback_query.answer()
+
+
+# Выгрузка пользователей в CSV (gzip): /export [стратегия] [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД]
+@router.message(Command("export"))
+async def admin_export(message: Message, command: CommandObject):
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("🚫 У вас нет прав для доступа.")
+        return
+
+    try:
+        filters = parse_export_args(command.args, quiz.strategy_types)
+    except ValueError:
+        await message.answer(
+            "Формат: /export [стратегия] [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД]\n"
+            f"Стратегии: {', '.join(quiz.strategy_types)}\n"
+            "Например: /export Умеренная 2025-01-01 2025-01-31",
+            parse_mode=None
+        )
+        return
+
+    if export_lock.locked():
+        await message.answer("⏳ Выгрузка уже выполняется, попробуйте позже.")
+        return
+
+    async with export_lock:
+        await message.answer("⏳ Готовлю выгрузку пользователей...")
+        # Отдельная сессия: серверный курсор не держит соединение и транзакцию апдейта,
+        # а транзакция чтения закрывается сразу после выгрузки, до отправки файла
+        async with async_session() as export_db, export_db.begin():
+            path, total = await export_users(export_db, **filters)
+        try:
+            if os.path.getsize(path) > EXPORT_MAX_FILE_SIZE:
+                await message.answer("Файл выгрузки больше лимита Telegram, уточните фильтр (стратегия или даты).")
+                return
+            filename = f"users_{datetime.utcnow():%Y%m%d_%H%M}.csv.gz"
+            await message.answer_document(FSInputFile(path, filename=filename), caption=f"Пользователей: {total}")
+        finally:
+            os.remove(path)
+
+    logger.info(f"Администратор {message.from_user.id} выгрузил пользователей ({total}), фильтр: {filters}")
@@ -0,0 +1,46 @@
+"""add quiz_answers
+
+Revision ID: 158ce2a256c6
+Revises: 6909d6324ce4
+Create Date: 2026-10-18 14:24:54.681263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Базы, созданные через Base.metadata.create_all (database.create_tables), уже содержат таблицу
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+# revision identifiers, used by Alembic.
+revision: str = '158ce2a256c6'
+down_revision: Union[str, Sequence[str], None] = '6909d6324ce4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _has_table("quiz_answers"):
+        return
+    op.create_table(
+        "quiz_answers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("quiz_version", sa.SmallInteger(), nullable=True),
+        sa.Column("question", sa.SmallInteger(), nullable=True),
+        sa.Column("option", sa.SmallInteger(), nullable=True),
+        sa.Column("answered_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_quiz_answers_user_id", "quiz_answers", ["user_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_quiz_answers_user_id", table_name="quiz_answers")
+    op.drop_table("quiz_answers")
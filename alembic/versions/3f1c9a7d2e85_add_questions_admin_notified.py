@@ -0,0 +1,41 @@
+"""add questions.admin_notified
+
+Revision ID: 3f1c9a7d2e85
+Revises: b6f63264c644
+Create Date: 2026-10-18 16:05:41.207318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2e85'
+down_revision: Union[str, Sequence[str], None] = 'b6f63264c644'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблица могла быть создана create_all уже с новой колонкой
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("questions")}
+    if "admin_notified" not in columns:
+        op.add_column("questions", sa.Column("admin_notified", sa.Boolean(), nullable=True))
+
+    # Уведомление о старых вопросах не повторяем: отмечаем ответы, отвеченные вопросы
+    # и вопросы пользователей, у которых admin_notified уже стоит
+    op.execute(
+        "UPDATE questions SET admin_notified = CASE WHEN answered = true "
+        "OR parent_question_id IS NOT NULL "
+        "OR user_id IN (SELECT user_id FROM users WHERE admin_notified = true) "
+        "THEN true ELSE false END "
+        "WHERE admin_notified IS NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("questions", "admin_notified")
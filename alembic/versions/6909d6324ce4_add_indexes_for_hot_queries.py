@@ -0,0 +1,43 @@
+"""add indexes for hot queries
+
+Revision ID: 6909d6324ce4
+Revises: a74705907568
+Create Date: 2026-10-18 14:13:48.839929
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Индексы для запросов бота: таблица -> колонки (имя индекса ix_<таблица>_<колонка>)
+INDEXES = {
+    "questions": ["answered", "user_id", "parent_question_id"],
+    "users": ["strategy_type", "last_interaction_date"],
+}
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6909d6324ce4'
+down_revision: Union[str, Sequence[str], None] = 'a74705907568'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for table, columns in INDEXES.items():
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        for column in columns:
+            name = f"ix_{table}_{column}"
+            if name not in existing:
+                op.create_index(name, table, [column])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, columns in INDEXES.items():
+        for column in columns:
+            op.drop_index(f"ix_{table}_{column}", table_name=table)
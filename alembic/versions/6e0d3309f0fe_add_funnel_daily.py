@@ -0,0 +1,48 @@
+"""add funnel_daily
+
+Revision ID: 6e0d3309f0fe
+Revises: a54c054b9774
+Create Date: 2026-10-18 14:28:26.473881
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e0d3309f0fe'
+down_revision: Union[str, Sequence[str], None] = 'a54c054b9774'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Базы, созданные через create_tables, уже содержат таблицу и индекс
+    inspector = sa.inspect(op.get_bind())
+
+    # Дневная сводка воронки (заполняется фоновой задачей funnel.FunnelReport)
+    if not inspector.has_table("funnel_daily"):
+        op.create_table(
+            "funnel_daily",
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("language_code", sa.String(length=10), nullable=False),
+            sa.Column("users", sa.Integer(), nullable=True),
+            sa.Column("policy_accepted", sa.Integer(), nullable=True),
+            sa.Column("test_passed", sa.Integer(), nullable=True),
+            sa.Column("guide_downloaded", sa.Integer(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("day", "language_code"),
+        )
+
+    # Пересчёт сводки за последние дни идёт по диапазону registration_date
+    if "ix_users_registration_date" not in {index["name"] for index in inspector.get_indexes("users")}:
+        op.create_index("ix_users_registration_date", "users", ["registration_date"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_users_registration_date", table_name="users")
+    op.drop_table("funnel_daily")
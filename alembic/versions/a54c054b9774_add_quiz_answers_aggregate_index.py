@@ -0,0 +1,36 @@
+"""add quiz_answers aggregate index
+
+Revision ID: a54c054b9774
+Revises: 158ce2a256c6
+Create Date: 2026-10-18 14:26:34.201511
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a54c054b9774'
+down_revision: Union[str, Sequence[str], None] = '158ce2a256c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Покрывающий индекс для сводки по ответам (database.get_quiz_answer_stats).
+    # Базы, созданные через create_tables, уже содержат его
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("quiz_answers")}
+    if "ix_quiz_answers_version_question" not in existing:
+        op.create_index(
+            "ix_quiz_answers_version_question",
+            "quiz_answers",
+            ["quiz_version", "question", "option", "user_id"],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_quiz_answers_version_question", table_name="quiz_answers")
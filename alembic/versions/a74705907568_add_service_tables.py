@@ -0,0 +1,83 @@
+"""add service tables
+
+Revision ID: a74705907568
+Revises: ef23e67a55a3
+Create Date: 2026-10-18 14:13:47.296019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# До перехода на миграции эти таблицы создавал create_all при старте бота
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a74705907568'
+down_revision: Union[str, Sequence[str], None] = 'ef23e67a55a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Состояния FSM (fsm_storage.SQLAlchemyStorage)
+    if not _has_table("fsm_states"):
+        op.create_table(
+            "fsm_states",
+            sa.Column("key", sa.String(length=255), nullable=False),
+            sa.Column("state", sa.String(length=100), nullable=True),
+            sa.Column("data", sa.Text(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("key"),
+        )
+
+    # Счётчики статистики
+    if not _has_table("bot_counters"):
+        op.create_table(
+            "bot_counters",
+            sa.Column("name", sa.String(length=50), nullable=False),
+            sa.Column("value", sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint("name"),
+        )
+
+    # Рассылки
+    if not _has_table("broadcasts"):
+        op.create_table(
+            "broadcasts",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("text", sa.Text(), nullable=True),
+            sa.Column("filters", sa.Text(), nullable=True),
+            sa.Column("status", sa.String(length=20), nullable=True),
+            sa.Column("cursor", sa.Integer(), nullable=True),
+            sa.Column("sent", sa.Integer(), nullable=True),
+            sa.Column("failed", sa.Integer(), nullable=True),
+            sa.Column("blocked", sa.Integer(), nullable=True),
+            sa.Column("created_by", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("finished_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+    # Кэш file_id медиафайлов
+    if not _has_table("media_files"):
+        op.create_table(
+            "media_files",
+            sa.Column("path", sa.String(length=255), nullable=False),
+            sa.Column("sha256", sa.String(length=64), nullable=True),
+            sa.Column("file_id", sa.String(length=255), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("path"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("media_files")
+    op.drop_table("broadcasts")
+    op.drop_table("bot_counters")
+    op.drop_table("fsm_states")
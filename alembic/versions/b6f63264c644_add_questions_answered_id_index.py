@@ -0,0 +1,35 @@
+"""add questions answered id index
+
+Revision ID: b6f63264c644
+Revises: 6e0d3309f0fe
+Create Date: 2026-10-18 14:52:10.318407
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6f63264c644'
+down_revision: Union[str, Sequence[str], None] = '6e0d3309f0fe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Составной индекс для постраничной очереди вопросов заменяет индекс по одному answered.
+    # В базах, созданных через create_tables, составной индекс уже есть, а старого нет
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("questions")}
+    if "ix_questions_answered_id" not in existing:
+        op.create_index("ix_questions_answered_id", "questions", ["answered", "id"])
+    if "ix_questions_answered" in existing:
+        op.drop_index("ix_questions_answered", table_name="questions")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_questions_answered", "questions", ["answered"])
+    op.drop_index("ix_questions_answered_id", table_name="questions")
@@ -0,0 +1,66 @@
+"""baseline schema
+
+Revision ID: c3be83576176
+Revises: 
+Create Date: 2026-10-18 14:13:45.768948
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Базы, созданные до Alembic через Base.metadata.create_all, уже содержат эти таблицы
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3be83576176'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("user_id", sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column("first_name", sa.String(length=100), nullable=True),
+            sa.Column("last_name", sa.String(length=100), nullable=True),
+            sa.Column("username", sa.String(length=100), nullable=True),
+            sa.Column("language_code", sa.String(length=10), nullable=True),
+            sa.Column("registration_date", sa.DateTime(), nullable=True),
+            sa.Column("policy_accepted", sa.Boolean(), nullable=True),
+            sa.Column("offer_accepted", sa.Boolean(), nullable=True),
+            sa.Column("score", sa.Integer(), nullable=True),
+            sa.Column("strategy_type", sa.String(length=50), nullable=True),
+            sa.Column("guide_downloaded", sa.Boolean(), nullable=True),
+            sa.Column("last_interaction_date", sa.DateTime(), nullable=True),
+            sa.Column("has_asked_question", sa.Boolean(), nullable=True),
+            sa.Column("admin_notified", sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint("user_id"),
+        )
+
+    if not _has_table("questions"):
+        op.create_table(
+            "questions",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("question", sa.String(), nullable=True),
+            sa.Column("answer", sa.String(), nullable=True),
+            sa.Column("answered", sa.Boolean(), nullable=True),
+            sa.Column("parent_question_id", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(["parent_question_id"], ["questions.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_questions_id", "questions", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("questions")
+    op.drop_table("users")
@@ -0,0 +1,42 @@
+"""add users.username_lower
+
+Revision ID: ef23e67a55a3
+Revises: c3be83576176
+Create Date: 2026-10-18 14:13:05.128413
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ef23e67a55a3'
+down_revision: Union[str, Sequence[str], None] = 'c3be83576176'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблица могла быть создана create_all уже с новой колонкой
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")}
+    if "username_lower" not in columns:
+        op.add_column("users", sa.Column("username_lower", sa.String(length=100), nullable=True))
+
+    # Заполняем колонку для уже существующих пользователей
+    op.execute(
+        "UPDATE users SET username_lower = LOWER(username) "
+        "WHERE username IS NOT NULL AND username_lower IS NULL"
+    )
+
+    indexes = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("users")}
+    if "ix_users_username_lower" not in indexes:
+        op.create_index("ix_users_username_lower", "users", ["username_lower"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_users_username_lower", table_name="users")
+    op.drop_column("users", "username_lower")
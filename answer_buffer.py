@@ -0,0 +1,40 @@
+# answer_buffer.py
+from datetime import datetime
+
+from config.config import ANSWERS_FLUSH_INTERVAL, ANSWERS_FLUSH_THRESHOLD, ANSWERS_MAX_PENDING
+from database import save_quiz_answers
+from write_buffer import WriteBehindBuffer
+
+
+# Буфер ответов на вопросы теста. Обработчик только добавляет кортеж в список,
+# запись в quiz_answers идёт одним INSERT (executemany).
+class AnswerBuffer(WriteBehindBuffer):
+    name = "ответов на тест"
+
+    def __init__(
+        self,
+        flush_interval: float = ANSWERS_FLUSH_INTERVAL,
+        flush_threshold: int = ANSWERS_FLUSH_THRESHOLD,
+        max_pending: int = ANSWERS_MAX_PENDING,
+    ):
+        super().__init__(flush_interval, flush_threshold)
+        self.max_pending = max_pending
+
+    def _new_pending(self):
+        return []  # (user_id, quiz_version, question, option, answered_at)
+
+    # Зафиксировать ответ (без обращения к базе данных)
+    def add(self, user_id: int, quiz_version: int, question: int, option: int, when: datetime = None):
+        self._pending.append((user_id, quiz_version, question, option, when or datetime.utcnow()))
+        self._added()
+
+    async def _write(self, db, batch):
+        await save_quiz_answers(db, batch)
+
+    # Возвращаем ответы в буфер; если база недоступна долго, старые отбрасываются
+    def _restore(self, batch):
+        self._pending = (batch + self._pending)[-self.max_pending:]
+
+
+# Общий экземпляр буфера ответов
+answer_buffer = AnswerBuffer()
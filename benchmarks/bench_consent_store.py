@@ -0,0 +1,62 @@
+# benchmarks/bench_consent_store.py
+# Память на 1 млн пользователей: прежний словарь user_acceptance
+# ({"policy": bool, "offer": bool} на каждого) против ConsentStore.
+import time
+import asyncio
+import tracemalloc
+
+from consent_store import ConsentStore, POLICY, OFFER
+
+USERS = 1_000_000
+
+
+def measure_memory(label: str, fill):
+    tracemalloc.start()
+    started = time.perf_counter()
+    container = fill()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<45} {current / 1024 / 1024:8.1f} МБ   пик {peak / 1024 / 1024:8.1f} МБ   "
+        f"{current / USERS:6.1f} байт/польз.   заполнение {elapsed:5.2f} с"
+    )
+    return container
+
+
+def fill_dict():
+    user_acceptance = {}
+    for user_id in range(USERS):
+        user_acceptance[user_id] = {"policy": False, "offer": False}
+        user_acceptance[user_id]["policy"] = not user_acceptance[user_id]["policy"]
+    return user_acceptance
+
+
+def fill_store(max_size: int):
+    store = ConsentStore(ttl=3600, max_size=max_size)
+    for user_id in range(USERS):
+        store._put(user_id, 0)
+        store._put(user_id, store._get(user_id) ^ POLICY)
+    return store
+
+
+async def measure_toggles(store: ConsentStore, n: int):
+    started = time.perf_counter()
+    for i in range(n):
+        await store.toggle(i, POLICY)
+        await store.toggle(i, OFFER)
+        await store.get(i)
+    elapsed = time.perf_counter() - started
+    print(f"{'ConsentStore: toggle + toggle + get':<45} {n / elapsed:10.0f} польз./с")
+
+
+def main():
+    print(f"--- {USERS:,} пользователей ---".replace(",", " "))
+    measure_memory("dict user_acceptance (было)", fill_dict)
+    store = measure_memory("ConsentStore без вытеснения", lambda: fill_store(USERS))
+    measure_memory("ConsentStore, max_size=100000", lambda: fill_store(100_000))
+    asyncio.run(measure_toggles(store, 200_000))
+
+
+if __name__ == "__main__":
+    main()
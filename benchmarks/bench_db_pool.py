@@ -0,0 +1,67 @@
+# benchmarks/bench_db_pool.py
+# Нагрузочный сценарий: как размер пула влияет на задержку обработчика.
+# Обработчик, как под DbSessionMiddleware, держит соединение всю обработку апдейта:
+# читает пользователя, затем «отвечает в Telegram» (пауза HANDLER_IO) и коммитит.
+# Одновременно обрабатывается CONCURRENCY апдейтов; при пуле меньше этого числа
+# апдейты ждут соединение, и ожидание попадает в задержку обработчика.
+import time
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import report, reset_database
+from database import DATABASE_URL, User, async_session
+from db_pool import pool_options
+
+REQUESTS = 2000
+CONCURRENCY = 50
+HANDLER_IO = 0.02  # Секунды ответа Bot API внутри обработчика
+POOL_SIZES = (2, 5, 10, 25, 50)
+
+
+async def fill_users(n: int = 1000):
+    async with async_session() as db:
+        db.add_all(User(user_id=i, first_name="Имя", username=f"user{i}") for i in range(n))
+        await db.commit()
+
+
+async def run(pool_size: int):
+    engine = create_async_engine(DATABASE_URL, **pool_options(DATABASE_URL, pool_size=pool_size, max_overflow=0, timeout=60))
+    session_pool = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    timings = []
+
+    async def handler(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            async with session_pool() as db:
+                await db.execute(select(User.first_name).where(User.user_id == i % 1000))
+                await asyncio.sleep(HANDLER_IO)
+                await db.commit()
+            timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(REQUESTS)))
+    total = time.perf_counter() - started
+    report(f"pool_size={pool_size}", timings, total)
+
+    status = engine.pool.status()
+    print(
+        f"{'':<45} ожидание соединения: среднее {status['wait_avg_ms']} мс, "
+        f"максимум {status['wait_max_ms']} мс, таймаутов {status['timeouts']}"
+    )
+    await engine.dispose()
+
+
+async def main():
+    await reset_database()
+    await fill_users()
+    print(f"--- {REQUESTS} апдейтов, одновременно {CONCURRENCY}, обработчик держит соединение {HANDLER_IO * 1000:.0f} мс ---")
+    for pool_size in POOL_SIZES:
+        await run(pool_size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+# benchmarks/bench_fsm_storage.py
+# Прохождение теста (7 вопросов) через MemoryStorage и SQLAlchemyStorage
+# с пакетной записью и с синхронной записью (flush_interval=0).
+import time
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from benchmarks.common import reset_database, report
+from fsm_storage import SQLAlchemyStorage
+
+USERS = 300
+QUESTIONS = 7
+
+
+# Один шаг теста в том же порядке вызовов, что и в handle_question
+async def quiz_step(storage, key, step):
+    data = await storage.get_data(key)
+    data["score"] = data.get("score", 0) + 2
+    await storage.set_data(key, data)
+    await storage.get_state(key)
+    await storage.set_state(key, f"Test:Q{step + 1}")
+
+
+async def run(label, storage):
+    timings = []
+    started = time.perf_counter()
+    for user_id in range(USERS):
+        key = StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+        await storage.set_state(key, None)
+        await storage.set_data(key, {"score": 0})
+        for step in range(QUESTIONS):
+            t0 = time.perf_counter()
+            await quiz_step(storage, key, step)
+            timings.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+    await storage.close()
+    report(label, timings, total)
+
+
+async def main():
+    await reset_database()
+    await run("MemoryStorage", MemoryStorage())
+    await run("SQLAlchemyStorage (пакетная запись)", SQLAlchemyStorage(flush_interval=0.5))
+    await reset_database()
+    await run("SQLAlchemyStorage (без кэша, синхронно)", SQLAlchemyStorage(flush_interval=0, cache_ttl=0))
+
+    # Проверяем, что состояние пережило «перезапуск» (новый экземпляр хранилища)
+    key = StorageKey(bot_id=42, chat_id=0, user_id=0)
+    print("Состояние после перезапуска:", await SQLAlchemyStorage().get_state(key))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+# benchmarks/bench_funnel.py
+# Отчёт «Воронка и когорты» на 1 млн пользователей: пересчёт funnel_daily
+# (полный и за последние дни), построение отчёта по сводке и отдача из кэша.
+import time
+import random
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, func, case
+
+from benchmarks.common import measure, reset_database
+from database import async_session, User, ACCEPTED_CONDITION, TEST_PASSED_CONDITION
+from funnel import FunnelReport
+
+USERS = 1_000_000
+DAYS = 365
+LANGUAGES = ["ru", "en", "uk", "kk", "be", "uz", None]
+
+
+async def fill_users():
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    batch = []
+    for user_id in range(1, USERS + 1):
+        registered = now - timedelta(seconds=rng.randrange(DAYS * 86400))
+        accepted = rng.random() < 0.7
+        passed = accepted and rng.random() < 0.6
+        batch.append({
+            "user_id": user_id,
+            "language_code": rng.choice(LANGUAGES),
+            "registration_date": registered,
+            "last_interaction_date": registered + timedelta(seconds=rng.randrange(int((now - registered).total_seconds()) + 1)),
+            "policy_accepted": accepted,
+            "offer_accepted": accepted,
+            "score": rng.randint(7, 28) if passed else 0,
+            "strategy_type": "Умеренная" if passed else None,
+            "guide_downloaded": passed and rng.random() < 0.5,
+        })
+        if len(batch) == 50000:
+            async with async_session() as db:
+                await db.execute(insert(User.__table__), batch)
+                await db.commit()
+            batch = []
+
+
+# Тот же отчёт без сводки: GROUP BY по всей таблице users на каждый запрос
+async def live_group_by(_):
+    day = func.date(User.registration_date)
+    async with async_session() as db:
+        await db.execute(
+            select(
+                day, User.language_code, func.count(),
+                func.sum(case((ACCEPTED_CONDITION, 1), else_=0)), func.sum(case((TEST_PASSED_CONDITION, 1), else_=0)),
+                func.sum(case((User.guide_downloaded.is_(True), 1), else_=0)),
+            ).group_by(day, User.language_code)
+        )
+
+
+async def main():
+    await reset_database()
+    started = time.perf_counter()
+    await fill_users()
+    print(f"Заполнение {USERS} пользователей: {time.perf_counter() - started:.1f} с")
+
+    report = FunnelReport(cache_ttl=3600)
+
+    started = time.perf_counter()
+    rows = await report.refresh(full=True)
+    print(f"{'Полный пересчёт funnel_daily':<45} {(time.perf_counter() - started) * 1000:10.1f} мс   строк {rows}")
+    started = time.perf_counter()
+    rows = await report.refresh()
+    print(f"{'Пересчёт за последние дни':<45} {(time.perf_counter() - started) * 1000:10.1f} мс   строк {rows}")
+
+    await measure("GROUP BY по users на каждый запрос", live_group_by, 3)
+
+    async def build(_):
+        async with async_session() as db:
+            await report._build(db)
+
+    async def cached(_):
+        async with async_session() as db:
+            await report.get(db)
+
+    await measure("Отчёт по funnel_daily (без кэша)", build, 20)
+    await measure("Отчёт из кэша", cached, 1000)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
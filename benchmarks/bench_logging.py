@@ -0,0 +1,124 @@
+# benchmarks/bench_logging.py
+# Задержка event loop при логировании: синхронный FileHandler + эхо SQL (как было)
+# против QueueHandler/QueueListener. Нагрузка — параллельные /start с записью в базу,
+# фоновая задача замеряет, насколько позже срока она просыпается.
+import os
+import time
+import asyncio
+import logging
+
+from benchmarks.common import BENCH_DIR, reset_database
+from database import async_session, upsert_user
+from logging_setup import setup_logging, stop_logging
+
+HANDLERS = 2000
+CONCURRENCY = 50
+PROBE_INTERVAL = 0.005  # Период задачи-пробы, секунды
+
+
+# Имитация /start: две строки лога о пользователе и upsert в базу
+async def handle_start(user_id: int, logger: logging.Logger):
+    logger.info(f"Команда /start получена от пользователя с telegram_id: {user_id}. Состояние инициализировано.")
+    logger.info(f"Имя пользователя: Имя, Фамилия: Фамилия, Username: user{user_id}, telegram_id: {user_id}, Язык: ru")
+    async with async_session() as db:
+        await upsert_user(db, user_id, "Имя", "Фамилия", f"user{user_id}", "ru")
+        await db.commit()
+
+
+async def probe(lags: list, done: asyncio.Event):
+    while not done.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - t0 - PROBE_INTERVAL))
+
+
+async def run(label: str, offset: int):
+    logger = logging.getLogger("bench.users")
+    lags, done = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, done))
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(i):
+        async with semaphore:
+            await handle_start(offset + i, logger)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(HANDLERS)))
+    total = time.perf_counter() - started
+    done.set()
+    await probe_task
+
+    ordered = sorted(lags)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    print(
+        f"{label:<55} {HANDLERS / total:>6.0f} /start в секунду   "
+        f"задержка loop: p50 {p50:6.3f} мс   p99 {p99:6.3f} мс   max {ordered[-1] * 1000:6.2f} мс"
+    )
+
+
+# FileHandler с fsync после каждой записи — приближение к медленному сетевому
+# тому /data, где запись не всегда попадает в page cache
+class FsyncFileHandler(logging.FileHandler):
+    def flush(self):
+        super().flush()
+        if self.stream:
+            os.fsync(self.stream.fileno())
+
+
+def configure_sync(log_file: str, handler_class=logging.FileHandler):
+    # Прежняя схема: basicConfig с FileHandler в потоке event loop и echo=True
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[handler_class(log_file)],
+        force=True,
+    )
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+    logging.getLogger("bench.users").setLevel(logging.INFO)
+
+
+def configure_queue(log_file: str, sql_level: str, user_level: str, handler_class=None):
+    listener = setup_logging(log_file=log_file, console=False)
+    if handler_class is not None:
+        handler = handler_class(log_file)
+        handler.setFormatter(listener.handlers[0].formatter)
+        listener.handlers[0].close()
+        listener.handlers = (handler,)
+    logging.getLogger("sqlalchemy.engine").setLevel(sql_level)
+    logging.getLogger("bench.users").setLevel(user_level)
+
+
+def reset_logging():
+    stop_logging()
+    logging.basicConfig(handlers=[logging.NullHandler()], force=True)
+
+
+async def main():
+    await reset_database()
+
+    configure_sync(os.path.join(BENCH_DIR, "sync.log"))
+    await run("FileHandler + эхо SQL (было)", 0)
+    reset_logging()
+
+    configure_queue(os.path.join(BENCH_DIR, "queue-sql.log"), "INFO", "INFO")
+    await run("QueueListener + эхо SQL", HANDLERS)
+    reset_logging()
+
+    configure_queue(os.path.join(BENCH_DIR, "queue.log"), "WARNING", "WARNING")
+    await run("QueueListener, SQL и данные пользователей выключены", 2 * HANDLERS)
+    reset_logging()
+
+    print("--- fsync после каждой записи (медленный диск) ---")
+    configure_sync(os.path.join(BENCH_DIR, "sync-fsync.log"), FsyncFileHandler)
+    await run("FileHandler + эхо SQL (было)", 3 * HANDLERS)
+    reset_logging()
+
+    configure_queue(os.path.join(BENCH_DIR, "queue-fsync.log"), "INFO", "INFO", FsyncFileHandler)
+    await run("QueueListener + эхо SQL", 4 * HANDLERS)
+    reset_logging()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
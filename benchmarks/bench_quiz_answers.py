@@ -0,0 +1,63 @@
+# benchmarks/bench_quiz_answers.py
+# Запись ответов на тест: INSERT + COMMIT на каждый ответ против буфера с executemany,
+# и время сводки для админ-панели на большой таблице quiz_answers.
+import time
+import random
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import insert, text
+
+from benchmarks.common import measure, reset_database
+from database import async_session, QuizAnswer, save_quiz_answers, get_quiz_answer_stats
+from answer_buffer import AnswerBuffer
+
+N = 5000
+AGGREGATE_ROWS = 300_000
+
+
+async def insert_one(i: int):
+    async with async_session() as db:
+        await db.execute(insert(QuizAnswer.__table__).values(
+            user_id=i, quiz_version=1, question=i % 7, option=i % 4, answered_at=datetime.utcnow(),
+        ))
+        await db.commit()
+
+
+async def main():
+    await reset_database()
+
+    print("--- Запись ответов ---")
+    await measure("INSERT + COMMIT на каждый ответ", insert_one, N)
+
+    buffer = AnswerBuffer(flush_interval=3600, flush_threshold=10 ** 9)
+    await measure("AnswerBuffer.add (в обработчике)", lambda i: asyncio.sleep(0, buffer.add(i, 1, i % 7, i % 4)), N)
+    started = time.perf_counter()
+    written = await buffer.flush()
+    elapsed = time.perf_counter() - started
+    print(f"{'AnswerBuffer.flush (executemany)':<45} {written / elapsed:>10.0f} отв/с   всего {elapsed * 1000:.1f} мс на {written}")
+
+    print(f"--- Сводка по {AGGREGATE_ROWS} ответам ---")
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    rows = []
+    for user_id in range(AGGREGATE_ROWS // 7):
+        for question in range(rng.randint(1, 7)):
+            rows.append((user_id, 1, question, rng.randrange(4), now))
+    for i in range(0, len(rows), 10000):
+        async with async_session() as db:
+            await save_quiz_answers(db, rows[i:i + 10000])
+
+    async def aggregate(_):
+        async with async_session() as db:
+            await get_quiz_answer_stats(db, 1)
+
+    await measure("get_quiz_answer_stats (покрывающий индекс)", aggregate, 20)
+    async with async_session() as db:
+        await db.execute(text("DROP INDEX ix_quiz_answers_version_question"))
+        await db.commit()
+    await measure("get_quiz_answer_stats (без индекса)", aggregate, 20)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+# benchmarks/bench_screens.py
+# CPU на апдейт: сборка клавиатур и текстов в каждом обработчике (как было)
+# против готовых экранов из screens.py и quiz_engine. Замеряется построение SendMessage,
+# которое aiogram делает в message.answer().
+import json
+import timeit
+
+from aiogram.methods import SendMessage
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove,
+)
+
+from config.config import QUIZ_FILE
+from quiz_engine import quiz
+from screens import POLICY, policy_keyboard, NEXT_ACTIONS_SCREEN
+
+N = 20000
+CHAT_ID = 42
+
+with open(QUIZ_FILE, encoding="utf-8") as f:
+    DEFINITION = json.load(f)
+STEPS = list(quiz.steps.values())
+
+
+# === Прежний код обработчиков ===
+def create_policy_keyboard(accepted_policy=False, accepted_offer=False):
+    policy_text = "✅ Политика конфиденциальности" if accepted_policy else "☐ Политика конфиденциальности"
+    offer_text = "✅ Публичная оферта" if accepted_offer else "☐ Публичная оферта"
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=policy_text, callback_data="accept_policy")],
+        [InlineKeyboardButton(text=offer_text, callback_data="accept_offer")],
+        [InlineKeyboardButton(text="Принять", callback_data="accept")]
+    ])
+
+
+def old_question(index: int):
+    question = DEFINITION["questions"][index]
+    return SendMessage(chat_id=CHAT_ID, text=question["text"], reply_markup=ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=option["text"])] for option in question["options"]],
+        resize_keyboard=True
+    ))
+
+
+def old_result(score: int):
+    for profile in DEFINITION["profiles"]:
+        result = profile["text"]
+        if score <= profile.get("max_score", score):
+            break
+    SendMessage(
+        chat_id=CHAT_ID,
+        text=f"✅ *Тест завершён!* Вот твой результат:\n\n{result}",
+        reply_markup=ReplyKeyboardRemove(),
+    )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📘 Скачать гайд", callback_data="download_guide")],
+        [InlineKeyboardButton(text="🔁 Пройти тест заново", callback_data="restart_test")]
+    ])
+    return SendMessage(chat_id=CHAT_ID, text="Что хочешь сделать дальше?", reply_markup=keyboard)
+
+
+# === Готовые экраны ===
+def new_question(index: int):
+    screen = STEPS[index].screen
+    return SendMessage(chat_id=CHAT_ID, text=screen.text, reply_markup=screen.reply_markup)
+
+
+def new_result(score: int):
+    screen = quiz.profile(score).screen
+    SendMessage(chat_id=CHAT_ID, text=screen.text, reply_markup=screen.reply_markup)
+    return SendMessage(chat_id=CHAT_ID, text=NEXT_ACTIONS_SCREEN.text, reply_markup=NEXT_ACTIONS_SCREEN.reply_markup)
+
+
+CASES = [
+    ("Клавиатура согласия", lambda: create_policy_keyboard(accepted_policy=True), lambda: policy_keyboard(POLICY)),
+    ("Экран вопроса", lambda: old_question(3), lambda: new_question(3)),
+    ("Экран результата", lambda: old_result(17), lambda: new_result(17)),
+]
+
+
+def main():
+    for label, old, new in CASES:
+        old_us = min(timeit.repeat(old, number=N, repeat=3)) / N * 1e6
+        new_us = min(timeit.repeat(new, number=N, repeat=3)) / N * 1e6
+        print(f"{label:<25} было {old_us:8.2f} мкс   стало {new_us:8.2f} мкс   x{old_us / new_us:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_startup.py
+# Повторяемый замер холодного старта: прежний порядок (sleep(7), create_all, команды
+# последовательно) против конвейера startup.run_startup на свежей SQLite-базе.
+import os
+import time
+import asyncio
+
+from benchmarks.common import BENCH_DIR
+from database import Base, engine, create_tables
+import startup
+from config.setup_commands import COMMANDS_STATE_FILE
+
+RUNS = 5
+LEGACY_SLEEP = 7.0  # Фиксированная пауза в начале прежнего main.py
+API_LATENCY = 0.15  # Имитация сетевой задержки Bot API
+
+
+class FakeBot:
+    id = 42
+
+    async def set_my_commands(self, commands, scope=None):
+        await asyncio.sleep(API_LATENCY)
+
+    async def delete_my_commands(self, scope=None):
+        await asyncio.sleep(API_LATENCY)
+
+
+async def drop_schema():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+    await engine.dispose()
+
+
+async def legacy_startup(bot):
+    await create_tables()
+    await bot.set_my_commands([])
+
+
+async def main():
+    bot = FakeBot()
+    legacy, pipeline = [], []
+
+    for _ in range(RUNS):
+        await drop_schema()
+        started = time.perf_counter()
+        await legacy_startup(bot)
+        legacy.append(time.perf_counter() - started + LEGACY_SLEEP)
+
+        await drop_schema()
+        if os.path.exists(COMMANDS_STATE_FILE):
+            os.remove(COMMANDS_STATE_FILE)  # Холодный старт: команды ещё не синхронизированы
+        started = time.perf_counter()
+        timer = await startup.run_startup(bot)
+        pipeline.append(time.perf_counter() - started)
+
+    print(f"База: {BENCH_DIR}/bench.db, задержка Bot API {API_LATENCY * 1000:.0f} мс, прогонов {RUNS}")
+    print(f"Прежний запуск (с учётом sleep(7)):  {sum(legacy) / RUNS * 1000:8.0f} мс")
+    print(f"Конвейер run_startup:               {sum(pipeline) / RUNS * 1000:8.0f} мс")
+    print(f"Фазы последнего прогона: {timer.summary()}")
+
+    # Перезапуск без изменений в командах и ADMIN_IDS: Bot API не вызывается
+    started = time.perf_counter()
+    timer = await startup.run_startup(bot)
+    print(f"Повторный старт (команды не менялись): {(time.perf_counter() - started) * 1000:.0f} мс — {timer.summary()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+# benchmarks/bench_throttling.py
+# Память и скорость ограничителя апдейтов: SlidingWindowLimiter (три числа на пользователя)
+# против наивного скользящего окна со списком отметок времени (deque на пользователя),
+# и ключи идемпотентности ExpiringKeys для нажатий кнопок.
+import time
+import tracemalloc
+from collections import deque
+
+from rate_limit import SlidingWindowLimiter, ExpiringKeys
+
+USERS = 100_000
+HITS_PER_USER = 10
+LIMIT = 20
+WINDOW = 10.0
+
+
+# Наивный вариант: отметки времени всех событий за окно
+class DequeLimiter:
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._hits = {}
+
+    def hit(self, key, now: float) -> bool:
+        hits = self._hits.setdefault(key, deque())
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            return False
+        hits.append(now)
+        return True
+
+
+def run(label: str, limiter):
+    tracemalloc.start()
+    started = time.perf_counter()
+    # Пользователи активны вперемешку, все события укладываются в одно окно
+    now = 1000.0
+    for _ in range(HITS_PER_USER):
+        for user_id in range(USERS):
+            now += 0.000001
+            limiter.hit(user_id, now)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    hits = USERS * HITS_PER_USER
+    print(
+        f"{label:<45} {hits / elapsed:10.0f} hit/с   {current / 1024 / 1024:7.1f} МБ   "
+        f"{current / USERS:6.1f} байт/польз."
+    )
+
+
+def run_keys():
+    keys = ExpiringKeys(ttl=1.0, max_keys=USERS)
+    tracemalloc.start()
+    started = time.perf_counter()
+    now = 1000.0
+    duplicates = 0
+    for i in range(USERS * HITS_PER_USER):
+        now += 0.0001  # ~10 000 нажатий в секунду: в памяти ключи за последнюю секунду
+        if not keys.add(hash((i % USERS, i % 7, "accept_policy")), now):
+            duplicates += 1
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{'ExpiringKeys, ttl 1 с':<45} {USERS * HITS_PER_USER / elapsed:10.0f} add/с   "
+        f"{current / 1024 / 1024:7.1f} МБ   ключей в памяти {len(keys)}"
+    )
+
+
+def main():
+    print(f"--- {USERS:,} пользователей по {HITS_PER_USER} апдейтов ---".replace(",", " "))
+    run("deque отметок времени на пользователя", DequeLimiter(LIMIT, WINDOW))
+    run("SlidingWindowLimiter", SlidingWindowLimiter(LIMIT, WINDOW, max_keys=USERS))
+    run_keys()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_user_export.py
+# Выгрузка 1 млн пользователей: потоковый export_users (серверный курсор + gzip пачками)
+# против загрузки всей таблицы в память и записи CSV целиком. Пик памяти — по tracemalloc.
+import io
+import os
+import csv
+import gzip
+import time
+import asyncio
+import tracemalloc
+
+from sqlalchemy import select
+
+from benchmarks.common import reset_database
+from benchmarks.bench_funnel import fill_users, USERS
+from database import async_session, EXPORT_COLUMNS
+from user_export import export_users
+
+
+# Как сделали бы без потоковой выгрузки: все строки в память, CSV в память, сжатие целиком
+async def export_in_memory(db):
+    rows = (await db.execute(select(*EXPORT_COLUMNS).order_by(EXPORT_COLUMNS[0]))).all()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in EXPORT_COLUMNS])
+    writer.writerows(rows)
+    data = gzip.compress(buffer.getvalue().encode("utf-8"))
+    return data, len(rows)
+
+
+async def run(label: str, func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    async with async_session() as db:
+        size, total = await func(db)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"{label:<40} {total / elapsed:>10.0f} строк/с   {elapsed:6.1f} с   "
+        f"файл {size / 1024 / 1024:6.1f} МБ   пик памяти {peak / 1024 / 1024:8.1f} МБ"
+    )
+
+
+async def streaming(db):
+    path, total = await export_users(db)
+    size = os.path.getsize(path)
+    os.remove(path)
+    return size, total
+
+
+async def in_memory(db):
+    data, total = await export_in_memory(db)
+    return len(data), total
+
+
+async def main():
+    await reset_database()
+    await fill_users()
+    print(f"--- {USERS} пользователей ---")
+    await run("export_users (поток, gzip пачками)", streaming)
+    await run("Вся таблица в память", in_memory)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
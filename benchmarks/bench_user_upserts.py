@@ -0,0 +1,94 @@
+# benchmarks/bench_user_upserts.py
+# Сравнение прежнего ORM-пути (SELECT + UPDATE + COMMIT + refresh) с точечными UPDATE/INSERT
+# хелперов записи пользователей и повторных вызовов, на которые отвечает кэш пользователей (user_cache).
+import asyncio
+
+from sqlalchemy import select
+
+from benchmarks.common import measure, reset_database
+from database import (
+    get_db, User,
+    upsert_user, set_user_acceptance, set_strategy_type, set_user_guide_downloaded, apply_counter_deltas,
+)
+from user_cache import user_cache
+
+N = 2000
+
+
+# Прежний путь записи для сравнения: загрузка ORM-объекта, изменение, коммит и refresh
+async def orm_add_user(db, user_id: int, first_name: str, last_name: str, username: str, language_code: str):
+    result = await db.execute(select(User).filter(User.user_id == user_id))
+    user = result.scalars().first()
+    if user:
+        if user.username != username:
+            user.username = username
+            user.username_lower = username.lower() if username else None
+            await db.commit()
+        return user
+
+    user = User(
+        user_id=user_id, first_name=first_name, last_name=last_name,
+        username=username, username_lower=username.lower() if username else None, language_code=language_code,
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+async def orm_update_user(db, user_id: int, **values):
+    result = await db.execute(select(User).filter(User.user_id == user_id))
+    user = result.scalars().first()
+    if user:
+        for name, value in values.items():
+            setattr(user, name, value)
+        await db.commit()
+        await db.refresh(user)
+    return user
+
+
+# Хелперы не коммитят сами (это делает DbSessionMiddleware), поэтому коммит, публикация
+# изменений в кэш и запись счётчиков добавлены явно — так сравнение с ORM-путём остаётся честным
+async def committed(db, coro):
+    result = await coro
+    await db.commit()
+    user_cache.commit_tracked(db)
+    await apply_counter_deltas(db)
+    return result
+
+
+async def main():
+    await reset_database()
+
+    async for db in get_db():
+        print("--- Новые пользователи ---")
+        await measure("ORM: SELECT + INSERT + refresh", lambda i: orm_add_user(db, N + i, "Имя", "Фамилия", f"user{N + i}", "ru"), N)
+        await measure("upsert_user (SELECT + INSERT IGNORE)", lambda i: committed(db, upsert_user(db, i, "Имя", "Фамилия", f"user{i}", "ru")), N)
+
+        # Сравнение запросов к базе: кэш очищается перед каждым замером
+        print("--- Повторный /start ---")
+        await measure("ORM: SELECT", lambda i: orm_add_user(db, i, "Имя", "Фамилия", f"user{i}", "ru"), N)
+        user_cache.clear()
+        await measure("upsert_user (SELECT, кэш пуст)", lambda i: committed(db, upsert_user(db, i, "Имя", "Фамилия", f"user{i}", "ru")), N)
+
+        print("--- Обновления ---")
+        await measure("ORM: SELECT + UPDATE + refresh", lambda i: orm_update_user(db, i, policy_accepted=True, offer_accepted=True), N)
+        user_cache.clear()
+        await measure("set_user_acceptance (UPDATE)", lambda i: committed(db, set_user_acceptance(db, i, True, True)), N)
+        user_cache.clear()
+        await measure("set_strategy_type (UPDATE)", lambda i: committed(db, set_strategy_type(db, i, 20, "Умеренная")), N)
+        user_cache.clear()
+        await measure("set_user_guide_downloaded (UPDATE)", lambda i: committed(db, set_user_guide_downloaded(db, i)), N)
+
+        # Повторы с заполненным кэшем: значения не изменились — запросов к базе нет
+        print("--- Повтор с кэшем пользователей ---")
+        await measure("upsert_user (промах: чтение строки в кэш)", lambda i: committed(db, upsert_user(db, i, "Имя", "Фамилия", f"user{i}", "ru")), N)
+        await measure("upsert_user (кэш)", lambda i: committed(db, upsert_user(db, i, "Имя", "Фамилия", f"user{i}", "ru")), N)
+        await measure("set_user_acceptance (кэш)", lambda i: committed(db, set_user_acceptance(db, i, True, True)), N)
+        await measure("set_strategy_type (кэш)", lambda i: committed(db, set_strategy_type(db, i, 20, "Умеренная")), N)
+        await measure("set_user_guide_downloaded (кэш)", lambda i: committed(db, set_user_guide_downloaded(db, i)), N)
+        print(f"user_cache: {user_cache.metrics()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+# benchmarks/bench_webhook.py
+# Нагрузочный тест webhook-режима: синтетические апдейты отправляются POST-запросами
+# в локальный aiohttp-сервер, замеряются время HTTP-ответа и задержка до завершения обработчика.
+import time
+import asyncio
+from datetime import datetime
+
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+from aiogram import Bot, Dispatcher, Router, F
+from aiogram.types import Message
+
+from benchmarks.common import report
+from webhook import create_app
+
+UPDATES = 3000
+CONCURRENCY = 50
+HANDLER_WORK = 0.005  # Имитация работы обработчика (запросы к БД и т.п.), секунды
+SECRET = "benchmark-secret"
+
+received_at = {}
+handler_latency = []
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now().timestamp()),
+            "chat": {"id": update_id, "type": "private"},
+            "from": {"id": update_id, "is_bot": False, "first_name": "Имя"},
+            "text": "а) Ответ",
+        },
+    }
+
+
+def build_dispatcher() -> Dispatcher:
+    router = Router()
+
+    @router.message(F.text)
+    async def handler(message: Message):
+        await asyncio.sleep(HANDLER_WORK)
+        handler_latency.append(time.perf_counter() - received_at[message.message_id])
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def main():
+    bot = Bot("42:BENCHMARK-TOKEN")
+    app = create_app(build_dispatcher(), bot, secret_token=SECRET, path="/webhook")
+    server = TestServer(app)
+    await server.start_server()
+
+    http_latency = []
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async with ClientSession() as session:
+        url = str(server.make_url("/webhook"))
+        headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+        # Запрос с неверным секретом должен отклоняться
+        async with session.post(url, json=make_update(0), headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as response:
+            print(f"Неверный секрет: HTTP {response.status}")
+
+        async def post(update_id):
+            async with semaphore:
+                received_at[update_id] = time.perf_counter()
+                async with session.post(url, json=make_update(update_id), headers=headers) as response:
+                    await response.read()
+                http_latency.append(time.perf_counter() - received_at[update_id])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(1, UPDATES + 1)))
+        while len(handler_latency) < UPDATES:
+            await asyncio.sleep(0.01)
+        total = time.perf_counter() - started
+
+        async with session.get(str(server.make_url("/health"))) as response:
+            print(f"/health: HTTP {response.status} {await response.json()}")
+
+    report("HTTP-ответ Telegram", http_latency, total)
+    report("Апдейт -> завершение обработчика", handler_latency, total)
+
+    await server.close()
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+# benchmarks/common.py
+# Общее окружение для бенчмарков: временная SQLite-база и фиктивный токен бота.
+# Запуск из корня репозитория: python -m benchmarks.<имя_модуля>
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+BENCH_DIR = tempfile.mkdtemp(prefix="riskbot-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{BENCH_DIR}/bench.db")
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK-TOKEN")
+os.environ.setdefault("DATA_DIR", BENCH_DIR)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+# Пересоздание схемы во временной базе
+async def reset_database():
+    async with database.engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.drop_all)
+        await conn.run_sync(database.Base.metadata.create_all)
+
+
+# Прогон асинхронной функции n раз с замером времени каждого вызова
+async def measure(label: str, func, n: int):
+    timings = []
+    started = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        await func(i)
+        timings.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+    report(label, timings, total)
+    return timings
+
+
+# Печать сводки: операций в секунду, среднее, p50 и p99 в миллисекундах
+def report(label: str, timings: list, total: float):
+    ordered = sorted(timings)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    print(
+        f"{label:<45} {len(timings) / total:>10.0f} оп/с   "
+        f"среднее {statistics.mean(timings) * 1000:7.3f} мс   p50 {p50:7.3f} мс   p99 {p99:7.3f} мс"
+    )
@@ -0,0 +1,173 @@
+# broadcast.py
+import json
+import asyncio
+import logging
+
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+
+from config.bot_instance import bot
+from config.config import BROADCAST_PAGE_SIZE, BROADCAST_CHUNK_SIZE
+from database import (
+    async_session, get_recipient_batch, create_broadcast, get_broadcast, get_running_broadcasts,
+    update_broadcast_progress,
+)
+from outbound import Lane, lane
+
+
+logger = logging.getLogger(__name__)
+
+
+# Сегменты получателей, доступные в админ-панели: код -> (название, фильтр)
+SEGMENTS = {
+    "all": ("Все пользователи", {}),
+    "accepted": ("Приняли Политику и Оферту", {"policy_accepted": True}),
+    "passed": ("Прошли тест", {"test_passed": True}),
+    "not_passed": ("Не прошли тест", {"test_passed": False}),
+    "guide": ("Скачали гайд", {"guide_downloaded": True}),
+    "no_guide": ("Прошли тест, но не скачали гайд", {"test_passed": True, "guide_downloaded": False}),
+    "conservative": ("Консервативная стратегия", {"strategy_type": "Консервативная"}),
+    "moderate": ("Умеренная стратегия", {"strategy_type": "Умеренная"}),
+    "aggressive": ("Агрессивная стратегия", {"strategy_type": "Агрессивная"}),
+}
+
+# Результаты доставки одному получателю
+SENT, FAILED, BLOCKED = "sent", "failed", "blocked"
+
+
+# Движок рассылок: выборка получателей страницами по первичному ключу
+# и контрольная точка на каждую пачку. Лимиты Telegram (общий и на чат) и повтор
+# после RetryAfter обеспечивает outbound_scheduler: сообщения рассылки идут в нём
+# с приоритетом BULK, после ответов пользователям и уведомлений.
+#
+# Доставка at-most-once: курсор пачки записывается в базу ДО отправки, после сбоя
+# или остановки процесса рассылка продолжается со следующей пачки и никому не приходит
+# дважды. Ценой этого прерывание посреди пачки может оставить без сообщения
+# не больше chunk_size получателей (их число не попадает в sent/failed/blocked).
+class BroadcastEngine:
+    def __init__(
+        self,
+        bot,
+        session_pool=async_session,
+        page_size: int = BROADCAST_PAGE_SIZE,
+        chunk_size: int = BROADCAST_CHUNK_SIZE,
+    ):
+        self.bot = bot
+        self.session_pool = session_pool
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self._tasks = {}  # broadcast_id -> asyncio.Task
+
+    # Отправка одному получателю. TelegramRetryAfter доходит сюда, только если
+    # outbound_scheduler исчерпал повторы, — такой получатель считается ошибкой
+    async def _deliver(self, chat_id: int, text: str):
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+            return SENT
+        except TelegramForbiddenError:
+            return BLOCKED
+        except TelegramAPIError as e:
+            logger.info(f"Не удалось отправить рассылку пользователю {chat_id}: {e}")
+            return FAILED
+
+    async def _run(self, broadcast_id: int, notify_chat_id: int = None):
+        # Сообщения рассылки уходят в общей очереди после ответов пользователям
+        with lane(Lane.BULK):
+            totals = await self._send_all(broadcast_id)
+
+        logger.info(f"Рассылка {broadcast_id} завершена: {totals}")
+        if notify_chat_id:
+            try:
+                with lane(Lane.NOTIFY):
+                    await self.bot.send_message(
+                        chat_id=notify_chat_id,
+                        text=(
+                            f"✅ Рассылка #{broadcast_id} завершена.\n"
+                            f"Доставлено: {totals[SENT]}, заблокировали бота: {totals[BLOCKED]}, ошибки: {totals[FAILED]}"
+                        ),
+                        parse_mode=None,
+                    )
+            except TelegramAPIError as e:
+                logger.warning(f"Не удалось уведомить администратора о рассылке {broadcast_id}: {e}")
+
+    async def _send_all(self, broadcast_id: int):
+        async with self.session_pool() as db:
+            broadcast = await get_broadcast(db, broadcast_id)
+            text, filters, cursor = broadcast.text, json.loads(broadcast.filters), broadcast.cursor
+
+        totals = {SENT: 0, FAILED: 0, BLOCKED: 0}
+        while True:
+            async with self.session_pool() as db:
+                page = await get_recipient_batch(db, filters, cursor, self.page_size)
+            if not page:
+                break
+
+            for i in range(0, len(page), self.chunk_size):
+                chunk = page[i:i + self.chunk_size]
+                cursor = chunk[-1]
+
+                # Контрольная точка до отправки (at-most-once): после сбоя эта пачка не повторяется
+                async with self.session_pool() as db:
+                    await update_broadcast_progress(db, broadcast_id, cursor=cursor)
+
+                results = await asyncio.gather(*(self._deliver(chat_id, text) for chat_id in chunk))
+                counts = {outcome: results.count(outcome) for outcome in totals}
+                for outcome, count in counts.items():
+                    totals[outcome] += count
+
+                async with self.session_pool() as db:
+                    await update_broadcast_progress(db, broadcast_id, **counts)
+
+        async with self.session_pool() as db:
+            await update_broadcast_progress(db, broadcast_id, status="done")
+        return totals
+
+    def _spawn(self, broadcast_id: int, notify_chat_id: int = None):
+        task = asyncio.create_task(self._run(broadcast_id, notify_chat_id))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda t: self._done(broadcast_id, t))
+        return task
+
+    # Задача рассылки завершилась: ошибку записываем в лог, иначе она потеряется вместе с задачей.
+    # Статус остаётся running — рассылка продолжится с контрольной точки при следующем resume()
+    def _done(self, broadcast_id: int, task: asyncio.Task):
+        self._tasks.pop(broadcast_id, None)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Рассылка {broadcast_id} прервана ошибкой: {error!r}")
+
+    # Создание и запуск рассылки. Возвращает ID рассылки
+    async def start(self, text: str, filters: dict, created_by: int):
+        async with self.session_pool() as db:
+            broadcast = await create_broadcast(db, text, json.dumps(filters, ensure_ascii=False), created_by)
+        self._spawn(broadcast.id, notify_chat_id=created_by)
+        return broadcast.id
+
+    # Продолжение рассылок, прерванных остановкой или сбоем процесса
+    async def resume(self):
+        async with self.session_pool() as db:
+            broadcast_ids = await get_running_broadcasts(db)
+        for broadcast_id in broadcast_ids:
+            if broadcast_id not in self._tasks:
+                logger.info(f"Продолжаем рассылку {broadcast_id} с контрольной точки")
+                self._spawn(broadcast_id)
+        return broadcast_ids
+
+    async def cancel(self, broadcast_id: int):
+        task = self._tasks.get(broadcast_id)
+        if task is not None:
+            task.cancel()
+        async with self.session_pool() as db:
+            await update_broadcast_progress(db, broadcast_id, status="cancelled")
+
+    # Остановка процесса: задачи прерываются, статус running сохраняется для resume()
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Общий экземпляр движка рассылок
+broadcast_engine = BroadcastEngine(bot)
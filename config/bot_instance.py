@@ -11,3 +11,8 @@ bot = Bot(
     token=BOT_TOKEN,
     default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
 )
+
+# Все запросы к чатам проходят через общую очередь с лимитами Telegram
+from outbound import OutboundMiddleware, outbound_scheduler
+
+bot.session.middleware(OutboundMiddleware(outbound_scheduler))
@@ -1,3 +1,102 @@
 # config.py
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 ADMIN_IDS = [5389520473, 5676986189]
+
+# Каталог для постоянных файлов бота (persistenceMount из amvera.yml, локально — текущий каталог)
+DATA_DIR = os.getenv("DATA_DIR", "/data" if os.path.isdir("/data") else ".")
+
+# === Отложенная запись last_interaction_date ===
+TOUCH_FLUSH_INTERVAL = float(os.getenv("TOUCH_FLUSH_INTERVAL", "5"))  # Секунды между сбросами буфера
+TOUCH_FLUSH_THRESHOLD = int(os.getenv("TOUCH_FLUSH_THRESHOLD", "500"))  # Сброс раньше срока при таком числе пользователей
+
+# === Хранилище состояний FSM ===
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sql")  # sql — в базе данных, memory — в памяти процесса
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))  # Секунды между пакетными записями (0 — запись сразу)
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "30"))  # Срок жизни записи в кэше чтения, секунды
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))  # Максимум ключей в кэше чтения
+
+# === Рассылки ===
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", "1000"))  # Получателей на одну страницу выборки
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", "25"))  # Получателей между контрольными точками
+
+# === Режим работы: polling или webhook ===
+BOT_MODE = os.getenv("BOT_MODE", "polling")  # polling — long polling, webhook — aiohttp-сервер на порту контейнера
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # Публичный адрес бота, например https://riskbot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Проверяется в заголовке X-Telegram-Bot-Api-Secret-Token, обязателен для webhook
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # Токен для /metrics (Authorization: Bearer ...); без него /metrics доступен только с localhost
+WEB_SERVER_HOST = os.getenv("WEB_SERVER_HOST", "0.0.0.0")
+WEB_SERVER_PORT = int(os.getenv("WEB_SERVER_PORT", "80"))  # containerPort из amvera.yml
+
+# === Запуск ===
+DB_CONNECT_ATTEMPTS = int(os.getenv("DB_CONNECT_ATTEMPTS", "10"))  # Попыток подключиться к БД при старте
+DB_CONNECT_BASE_DELAY = float(os.getenv("DB_CONNECT_BASE_DELAY", "0.25"))  # Первая пауза между попытками, секунды
+DB_CONNECT_MAX_DELAY = float(os.getenv("DB_CONNECT_MAX_DELAY", "5"))  # Максимальная пауза между попытками, секунды
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "5"))  # Сколько соединений открыть заранее
+
+# === Пул соединений с БД ===
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # Постоянных соединений в пуле
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))  # Временных соединений сверх DB_POOL_SIZE в пик
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # Сколько секунд ждать свободное соединение
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Пересоздавать соединение старше стольких секунд (меньше wait_timeout MySQL)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"  # Проверять соединение перед выдачей из пула
+
+# === Очередь исходящих сообщений ===
+OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", "30"))  # Запросов в секунду на весь бот
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))  # Запросов в секунду в один чат
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "5"))  # Допустимый всплеск в один чат (ответ + клавиатура и т.п.)
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "16"))  # Параллельных запросов к Bot API
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))  # Повторов после TelegramRetryAfter
+
+# === Логирование ===
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(DATA_DIR, "app.log"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Размер файла лога до ротации
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))  # Сколько старых файлов хранить
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "1") == "1"  # Дублировать логи в консоль
+SQL_LOG_LEVEL = os.getenv("SQL_LOG_LEVEL", "WARNING")  # INFO — каждый SQL-запрос (бывший echo=True), DEBUG — и строки результата
+USER_LOG_LEVEL = os.getenv("USER_LOG_LEVEL", "WARNING")  # INFO — данные пользователя на каждый /start
+
+# === Защита от флуда ===
+THROTTLE_LIMIT = int(os.getenv("THROTTLE_LIMIT", "20"))  # Апдейтов от одного пользователя за окно
+THROTTLE_WINDOW = float(os.getenv("THROTTLE_WINDOW", "10"))  # Длина скользящего окна, секунды
+CALLBACK_DEDUP_WINDOW = float(os.getenv("CALLBACK_DEDUP_WINDOW", "1"))  # Повтор той же кнопки в том же сообщении за это время не обрабатывается
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "100000"))  # Максимум пользователей и ключей в памяти
+
+# === Кэш пользователей ===
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "100000"))  # Максимум строк users в памяти
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "600"))  # Сколько секунд доверять строке без перечитывания из базы
+
+# === Согласие с Политикой и Офертой ===
+CONSENT_TTL = int(os.getenv("CONSENT_TTL", "86400"))  # Сколько секунд хранить отметки в памяти
+CONSENT_CACHE_SIZE = int(os.getenv("CONSENT_CACHE_SIZE", "100000"))  # Максимум пользователей в памяти
+
+# === Тест ===
+QUIZ_FILE = os.getenv("QUIZ_FILE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "quiz", "risk_profile.json"))
+ANSWERS_FLUSH_INTERVAL = float(os.getenv("ANSWERS_FLUSH_INTERVAL", "2"))  # Секунды между записями ответов на тест
+ANSWERS_FLUSH_THRESHOLD = int(os.getenv("ANSWERS_FLUSH_THRESHOLD", "1000"))  # Запись раньше срока при таком числе ответов
+ANSWERS_MAX_PENDING = int(os.getenv("ANSWERS_MAX_PENDING", "100000"))  # Предел буфера, если база недоступна
+
+# === Воронка и когорты ===
+FUNNEL_REFRESH_INTERVAL = float(os.getenv("FUNNEL_REFRESH_INTERVAL", "600"))  # Секунды между пересчётами funnel_daily
+FUNNEL_REFRESH_DAYS = int(os.getenv("FUNNEL_REFRESH_DAYS", "60"))  # За сколько последних дней регистрации пересчитывать
+FUNNEL_FULL_REFRESH_INTERVAL = float(os.getenv("FUNNEL_FULL_REFRESH_INTERVAL", "86400"))  # Секунды между полными пересчётами funnel_daily (за всё время)
+FUNNEL_CACHE_TTL = int(os.getenv("FUNNEL_CACHE_TTL", "300"))  # Длина интервала, на который кэшируется отчёт, секунды
+FUNNEL_WEEKS = int(os.getenv("FUNNEL_WEEKS", "8"))  # Сколько недель регистрации показывать
+
+# === Вопросы пользователей ===
+QUESTIONS_PAGE_SIZE = int(os.getenv("QUESTIONS_PAGE_SIZE", "10"))  # Вопросов на странице /questions
+QUESTIONS_CACHE_PAGES = int(os.getenv("QUESTIONS_CACHE_PAGES", "64"))  # Сколько готовых страниц держать в памяти
+ADMIN_NOTIFY_WINDOW = float(os.getenv("ADMIN_NOTIFY_WINDOW", "60"))  # Вопросы за это число секунд после уведомления собираются в одну сводку
+ADMIN_NOTIFY_RETRIES = int(os.getenv("ADMIN_NOTIFY_RETRIES", "3"))  # Повторов отправки уведомления при сетевой ошибке
+ADMIN_NOTIFY_MAX_ATTEMPTS = int(os.getenv("ADMIN_NOTIFY_MAX_ATTEMPTS", "5"))  # Окон подряд, в которые недоставленный вопрос отправляется снова (дальше — только после перезапуска)
+ADMIN_DIGEST_MAX_ITEMS = int(os.getenv("ADMIN_DIGEST_MAX_ITEMS", "10"))  # Вопросов с кнопкой «Ответить» в одной сводке
+
+# === Выгрузка пользователей ===
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))  # Строк в одной пачке серверного курсора
+EXPORT_COMPRESS_LEVEL = int(os.getenv("EXPORT_COMPRESS_LEVEL", "5"))  # Уровень gzip: 9 почти не уменьшает файл, но в разы медленнее
+EXPORT_MAX_FILE_SIZE = int(os.getenv("EXPORT_MAX_FILE_SIZE", str(50 * 1024 * 1024)))  # Лимит Bot API на отправку файла
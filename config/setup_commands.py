@@ -1,19 +1,79 @@
-from aiogram import types
-from aiogram.types import BotCommand
-from config.config import ADMIN_IDS
+import os
+import json
+import asyncio
+import hashlib
+import logging
 
+from aiogram.types import BotCommand, BotCommandScopeDefault, BotCommandScopeChat
+from config.config import ADMIN_IDS, DATA_DIR
 
-# Функция для установки команд бота
-async def set_bot_commands(bot, user_id):
-    commands = [
-        BotCommand(command="start", description="Запуск бота"),
-        BotCommand(command="help", description="Помощь")
+
+logger = logging.getLogger(__name__)
+
+# Команды для всех пользователей
+DEFAULT_COMMANDS = [
+    BotCommand(command="start", description="Запуск бота"),
+    BotCommand(command="help", description="Помощь")
+]
+
+# Команды администраторов (видны только в их чатах)
+ADMIN_COMMANDS = DEFAULT_COMMANDS + [
+    BotCommand(command="admin", description="Админ-панель"),
+    BotCommand(command="questions", description="Вопросы пользователей"),
+    BotCommand(command="export", description="Выгрузка пользователей")
+]
+
+# Файл с хэшем последней синхронизации команд
+COMMANDS_STATE_FILE = os.path.join(DATA_DIR, "bot_commands.json")
+
+
+# Хэш набора команд, списка администраторов и бота — при его смене команды нужно обновить
+def commands_hash(bot_id: int, admin_ids: list) -> str:
+    payload = {
+        "bot_id": bot_id,
+        "default": [command.model_dump() for command in DEFAULT_COMMANDS],
+        "admin": [command.model_dump() for command in ADMIN_COMMANDS],
+        "admin_ids": sorted(admin_ids),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _load_state(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path: str, state: dict):
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить состояние команд бота в {path}: {e}")
+
+
+# Функция для установки команд бота: общие команды и отдельный список в чате каждого администратора.
+# Вызывается при запуске; запросы к Bot API уходят, только если изменились команды или ADMIN_IDS
+async def sync_bot_commands(bot, admin_ids: list = ADMIN_IDS, state_file: str = COMMANDS_STATE_FILE, force: bool = False):
+    digest = commands_hash(bot.id, admin_ids)
+    state = _load_state(state_file)
+    if not force and state.get("hash") == digest:
+        return False
+
+    requests = [bot.set_my_commands(DEFAULT_COMMANDS, scope=BotCommandScopeDefault())]
+    requests += [
+        bot.set_my_commands(ADMIN_COMMANDS, scope=BotCommandScopeChat(chat_id=admin_id))
+        for admin_id in admin_ids
+    ]
+    # Бывшим администраторам возвращаем общий список команд
+    requests += [
+        bot.delete_my_commands(scope=BotCommandScopeChat(chat_id=admin_id))
+        for admin_id in set(state.get("admin_ids", [])) - set(admin_ids)
     ]
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id in ADMIN_IDS:
-        # Если это администратор, добавляем дополнительные команды
-        commands.append(BotCommand(command="admin", description="Админ-панель"))
-        commands.append(BotCommand(command="questions", description="Вопросы пользователей"))
-    
-    await bot.set_my_commands(commands)
+    await asyncio.gather(*requests)
+
+    _save_state(state_file, {"hash": digest, "admin_ids": list(admin_ids)})
+    logger.info(f"Команды бота обновлены (администраторов: {len(admin_ids)})")
+    return True
@@ -0,0 +1,78 @@
+# consent_store.py
+import time
+from collections import OrderedDict
+
+from config.config import CONSENT_TTL, CONSENT_CACHE_SIZE
+
+
+# Флаги отметок на экране согласия
+POLICY = 1
+OFFER = 2
+ALL_ACCEPTED = POLICY | OFFER
+
+# Ключ в данных FSM, куда дублируются отметки (переживают перезапуск бота)
+FSM_KEY = "consent"
+
+
+# Отметки «Политика» / «Оферта» до нажатия «Принять».
+# На пользователя хранится одно int: (срок_годности << 2) | флаги — без словаря на каждого.
+# Записи старше ttl и сверх max_size (самые давно используемые) вытесняются.
+# Если записи в памяти нет, отметки берутся из данных FSM.
+class ConsentStore:
+    def __init__(self, ttl: int = CONSENT_TTL, max_size: int = CONSENT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user_id -> (expires_at << 2) | flags
+
+    def _get(self, user_id: int):
+        packed = self._entries.get(user_id)
+        if packed is None:
+            return None
+        if packed >> 2 <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return packed & ALL_ACCEPTED
+
+    def _put(self, user_id: int, flags: int):
+        self._entries[user_id] = (int(time.monotonic()) + self.ttl) << 2 | flags
+        self._entries.move_to_end(user_id)
+
+        # Вытесняем давно неиспользуемые и просроченные записи с начала очереди
+        now = time.monotonic()
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if len(self._entries) <= self.max_size and oldest >> 2 > now:
+                break
+            self._entries.popitem(last=False)
+
+    # Текущие флаги пользователя (0, если отметок нет)
+    async def get(self, user_id: int, state=None) -> int:
+        flags = self._get(user_id)
+        if flags is None:
+            flags = 0
+            if state is not None:
+                flags = (await state.get_data()).get(FSM_KEY, 0)
+            self._put(user_id, flags)
+        return flags
+
+    async def set(self, user_id: int, flags: int, state=None):
+        self._put(user_id, flags)
+        if state is not None:
+            await state.update_data({FSM_KEY: flags})
+
+    # Переключение одной отметки. Возвращает новые флаги
+    async def toggle(self, user_id: int, flag: int, state=None) -> int:
+        flags = await self.get(user_id, state) ^ flag
+        await self.set(user_id, flags, state)
+        return flags
+
+    def discard(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Общее хранилище отметок согласия
+consent_store = ConsentStore()
@@ -1,14 +1,25 @@
 import os
 import asyncio
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey, DateTime
+from typing import NamedTuple
+from sqlalchemy import create_engine, Column, Integer, SmallInteger, String, Boolean, ForeignKey, Date, DateTime, Text
+from sqlalchemy import insert, Index
+from sqlalchemy import update, delete, bindparam, and_, or_, case
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from dotenv import load_dotenv
+from alembic import command
+from alembic.config import Config
+
+from user_cache import user_cache
+from db_pool import pool_options
 
 
 # Загружает переменные из .env файла
@@ -25,154 +36,456 @@ class User(Base):
     first_name = Column(String(100))
     last_name = Column(String(100))
     username = Column(String(100))
+    username_lower = Column(String(100), index=True)  # username в нижнем регистре для поиска по индексу
     language_code = Column(String(10))
-    registration_date = Column(DateTime, default=datetime.utcnow)
+    registration_date = Column(DateTime, default=datetime.utcnow, index=True)
     policy_accepted = Column(Boolean, default=False)
     offer_accepted = Column(Boolean, default=False)
     score = Column(Integer, default=0)
-    strategy_type = Column(String(50))
+    strategy_type = Column(String(50), index=True)
     guide_downloaded = Column(Boolean, default=False)
-    last_interaction_date = Column(DateTime, default=datetime.utcnow)
+    last_interaction_date = Column(DateTime, default=datetime.utcnow, index=True)
     has_asked_question = Column(Boolean, default=False)
     admin_notified = Column(Boolean, default=False)
 
 
+# Снимок строки users для кэша (user_cache): все поля, кроме дат.
+# last_interaction_date меняется на каждое действие и пишется буфером, в кэше её нет
+class UserSnapshot(NamedTuple):
+    user_id: int
+    first_name: str = None
+    last_name: str = None
+    username: str = None
+    language_code: str = None
+    policy_accepted: bool = False
+    offer_accepted: bool = False
+    score: int = 0
+    strategy_type: str = None
+    guide_downloaded: bool = False
+    has_asked_question: bool = False
+    admin_notified: bool = False
+
+
+USER_SNAPSHOT_COLUMNS = tuple(getattr(User, name) for name in UserSnapshot._fields)
+
+
 # Модель Question для фиксации вопросов и ответов
 class Question(Base):
     __tablename__ = 'questions'
+    __table_args__ = (
+        # Очередь открытых вопросов в /questions: WHERE answered = ... ORDER BY id (см. get_open_questions_page)
+        Index("ix_questions_answered_id", "answered", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)  # Порядковый номер
-    user_id = Column(Integer)  # ID пользователя, задавшего вопрос
+    user_id = Column(Integer, index=True)  # ID пользователя, задавшего вопрос
     question = Column(String)  # Текст вопроса
     answer = Column(String, nullable=True)  # Ответ администратора
     answered = Column(Boolean, default=False)  # Статус ответа (по умолчанию False)
-    parent_question_id = Column(Integer, ForeignKey('questions.id'), nullable=True)  # Связь с вопросом, на который отвечает
+    admin_notified = Column(Boolean, default=False)  # Уведомление о вопросе доставлено администраторам (см. admin_notifier)
+    parent_question_id = Column(Integer, ForeignKey('questions.id'), nullable=True, index=True)  # Связь с вопросом, на который отвечает
 
     # Отношение: Если это ответ, то parent_question_id указывает на вопрос
     parent_question = relationship("Question", remote_side=[id])
 
 
+# Модель для хранения состояний FSM (см. fsm_storage.SQLAlchemyStorage)
+class FsmState(Base):
+    __tablename__ = 'fsm_states'
+
+    key = Column(String(255), primary_key=True)  # Ключ вида fsm:<bot_id>:<chat_id>:<user_id>
+    state = Column(String(100), nullable=True)  # Текущее состояние (например, Test:Q3)
+    data = Column(Text, nullable=True)  # Данные состояния в JSON
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Модель счётчиков статистики бота (обновляются хелперами при каждом событии)
+class BotCounter(Base):
+    __tablename__ = 'bot_counters'
+
+    name = Column(String(50), primary_key=True)  # Имя счётчика (см. BOT_COUNTERS)
+    value = Column(Integer, default=0)
+
+
+# Модель рассылки с контрольной точкой для продолжения после сбоя
+class Broadcast(Base):
+    __tablename__ = 'broadcasts'
+
+    id = Column(Integer, primary_key=True)
+    text = Column(Text)  # Текст рассылки (HTML)
+    filters = Column(Text)  # Фильтр получателей в JSON (см. broadcast.SEGMENTS)
+    status = Column(String(20), default="running")  # running / done / cancelled
+    cursor = Column(Integer, default=0)  # Последний user_id, взятый в отправку
+    sent = Column(Integer, default=0)  # Доставлено
+    failed = Column(Integer, default=0)  # Ошибки доставки
+    blocked = Column(Integer, default=0)  # Пользователь заблокировал бота
+    created_by = Column(Integer)  # ID администратора
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+# Модель кэша file_id для статических файлов, отправляемых ботом
+class MediaFile(Base):
+    __tablename__ = 'media_files'
+
+    path = Column(String(255), primary_key=True)  # Путь к файлу относительно рабочей директории
+    sha256 = Column(String(64))  # Хэш содержимого, для которого получен file_id
+    file_id = Column(String(255))  # file_id, который вернул Telegram после загрузки
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Модель ответов на вопросы теста: одна строка на ответ, только номера
+# (тексты вопросов и вариантов — в описании теста нужной версии, см. quiz_engine)
+class QuizAnswer(Base):
+    __tablename__ = 'quiz_answers'
+    __table_args__ = (
+        # Покрывающий индекс для сводки в админ-панели (get_quiz_answer_stats)
+        Index("ix_quiz_answers_version_question", "quiz_version", "question", "option", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, index=True)
+    quiz_version = Column(SmallInteger)  # Версия описания теста (quiz/*.json)
+    question = Column(SmallInteger)  # Номер вопроса с 0
+    option = Column(SmallInteger)  # Номер варианта ответа с 0
+    answered_at = Column(DateTime)
+
+
+# Дневная сводка воронки: пользователи, зарегистрированные в этот день, с разбивкой по языку.
+# Пересчитывается в фоне (см. funnel.FunnelReport), отчёт в админ-панели читает только её
+class FunnelDaily(Base):
+    __tablename__ = 'funnel_daily'
+
+    day = Column(Date, primary_key=True)  # День регистрации (UTC)
+    language_code = Column(String(10), primary_key=True)  # Язык пользователя, "" — не указан
+    users = Column(Integer, default=0)  # Нажали /start
+    policy_accepted = Column(Integer, default=0)  # Приняли Политику и Оферту
+    test_passed = Column(Integer, default=0)  # Прошли тест
+    guide_downloaded = Column(Integer, default=0)  # Скачали гайд
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 
 # Устанавливаем асинхронное соединение с MySQL
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Создаем асинхронный движок SQLAlchemy
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Логирование SQL-запросов — через уровень логгера sqlalchemy.engine (SQL_LOG_LEVEL).
+# Размер пула, таймауты и pre_ping задаются переменными DB_POOL_* (см. db_pool.pool_options)
+engine = create_async_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 
 # Создание асинхронной сессии
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
-# Создание таблиц в базе данных (асинхронно)
+# Создание таблиц в базе данных (асинхронно).
+# Бот использует миграции (run_migrations); create_all остаётся для локальных проверок и бенчмарков
 async def create_tables():
     async with engine.begin() as conn:
         # Создаем таблицы в базе данных
         await conn.run_sync(Base.metadata.create_all)
 
+
+# Применение миграций Alembic до последней версии на соединении бота
+async def run_migrations():
+    def upgrade(connection):
+        config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+        config.attributes["connection"] = connection
+        config.attributes["configure_logger"] = False  # Не перенастраиваем логирование бота
+        command.upgrade(config, "head")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(upgrade)
+
 # Функция для получения сессии
 async def get_db():
     async with async_session() as session:
         yield session
 
-# Функция добавления пользователя в базу данных (асинхронно)
-async def add_user(db: AsyncSession, user_id: int, first_name: str, last_name: str, username: str, language_code: str):
-    # Проверяем, существует ли пользователь в базе данных
-    result = await db.execute(select(User).filter(User.user_id == user_id))
-    existing_user = result.scalars().first()
-
-    if existing_user:
-        # Если пользователь уже существует, можно обновить его данные (если нужно)
-        return existing_user
-
-    # Если пользователь новый, добавляем его в базу данных
-    db_user = User(
-        user_id=user_id, 
-        first_name=first_name, 
-        last_name=last_name, 
-        username=username, 
-        language_code=language_code
+# Загрузка снимка пользователя из базы (для user_cache.get)
+async def _load_user_snapshot(db: AsyncSession, user_id: int):
+    result = await db.execute(select(*USER_SNAPSHOT_COLUMNS).where(User.user_id == user_id))
+    row = result.first()
+    return UserSnapshot(*row) if row is not None else None
+
+
+# === Счётчики статистики ===
+
+BOT_COUNTERS = ("total_users", "policy_accepted", "test_passed", "guide_downloaded")
+
+# Условия «принял Политику и Оферту» и «прошёл тест» (в терминах get_bot_statistics)
+ACCEPTED_CONDITION = and_(User.policy_accepted.is_(True), User.offer_accepted.is_(True))
+TEST_PASSED_CONDITION = and_(func.coalesce(User.score, 0) > 0, User.strategy_type.isnot(None))
+
+
+# Ключ в session.info: изменения счётчиков, накопленные в транзакции события
+COUNTERS_KEY = "bot_counter_deltas"
+
+
+# Изменение счётчика копится в сессии и записывается после коммита события (apply_counter_deltas):
+# строка bot_counters общая для всех апдейтов, и её блокировку нельзя держать всю обработку
+# апдейта, пока обработчик ждёт отправки сообщений
+def increment_counter(db: AsyncSession, name: str, delta: int = 1):
+    deltas = db.info.setdefault(COUNTERS_KEY, {})
+    deltas[name] = deltas.get(name, 0) + delta
+
+
+# Запись накопленных изменений счётчиков отдельной короткой транзакцией.
+# Счётчики обновляются в одном порядке, чтобы параллельные транзакции не блокировали друг друга
+async def apply_counter_deltas(db: AsyncSession):
+    deltas = db.info.pop(COUNTERS_KEY, None)
+    if not deltas:
+        return
+    for name, delta in sorted(deltas.items()):
+        if delta:
+            await db.execute(
+                update(BotCounter).where(BotCounter.name == name).values(value=BotCounter.value + delta)
+            )
+    await db.commit()
+
+
+# Транзакция события откатилась — её изменения счётчиков не применяются
+def discard_counter_deltas(db: AsyncSession):
+    db.info.pop(COUNTERS_KEY, None)
+
+
+# COUNT(*) FILTER (WHERE ...) не поддерживается MySQL: считаем через SUM(CASE ...)
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+# === Точечные UPDATE/INSERT без загрузки ORM-объекта ===
+# Каждая функция выполняет один запрос вместо SELECT + UPDATE + COMMIT + refresh.
+# Коммит делает вызывающий код (DbSessionMiddleware — один раз на апдейт).
+
+# INSERT, который молча пропускает уже существующую строку (с учётом диалекта)
+def _insert_ignore(db: AsyncSession, table, values: dict):
+    dialect = db.bind.dialect.name
+    if dialect == "mysql":
+        # INSERT IGNORE: в отличие от ON DUPLICATE KEY UPDATE, rowcount однозначен
+        # (1 — вставлено, 0 — дубликат) и при флаге CLIENT_FOUND_ROWS
+        return mysql_insert(table).values(**values).prefix_with("IGNORE")
+    if dialect == "postgresql":
+        return postgresql_insert(table).values(**values).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite_insert(table).values(**values).on_conflict_do_nothing()
+    raise NotImplementedError(f"Диалект {dialect} не поддерживается")
+
+
+# INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE для executemany (с учётом диалекта)
+def _upsert(db: AsyncSession, table, index_elements: list, update_columns: list):
+    dialect = db.bind.dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in update_columns})
+    if dialect == "postgresql":
+        stmt = postgresql_insert(table)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(table)
+    else:
+        raise NotImplementedError(f"Диалект {dialect} не поддерживается")
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={name: stmt.excluded[name] for name in update_columns}
+    )
+
+
+# Функция добавления пользователя. Возвращает True, если пользователь новый.
+# Повторный /start пользователя из кэша с тем же username в базу не обращается.
+# При промахе кэша — одна выборка строки (она же после коммита заполняет кэш),
+# затем запись, только если она нужна: INSERT нового пользователя или UPDATE username
+async def upsert_user(db: AsyncSession, user_id: int, first_name: str, last_name: str, username: str, language_code: str):
+    cached = user_cache.peek_for(db, user_id)
+    if cached is not None and cached.username == username:
+        return False
+
+    username_lower = username.lower() if username else None
+    snapshot = await _load_user_snapshot(db, user_id)
+    if snapshot is None:
+        stmt = _insert_ignore(db, User.__table__, {
+            "user_id": user_id,
+            "first_name": first_name,
+            "last_name": last_name,
+            "username": username,
+            "username_lower": username_lower,
+            "language_code": language_code,
+        })
+        result = await db.execute(stmt)
+        # rowcount 0 — строку между выборкой и INSERT вставил параллельный апдейт
+        created = result.rowcount == 1
+        if created:
+            increment_counter(db, "total_users")
+            user_cache.stage(db, user_id, UserSnapshot(user_id, first_name, last_name, username, language_code))
+        return created
+
+    # Пользователь уже есть: синхронизируем username, только если он изменился
+    if snapshot.username != username:
+        await db.execute(
+            update(User)
+            .where(User.user_id == user_id)
+            .values(username=username, username_lower=username_lower)
+        )
+        snapshot = snapshot._replace(username=username)
+    user_cache.stage(db, user_id, snapshot)
+    return False
+
+
+# Условный UPDATE для событий статистики: сначала обновляем строку, только если
+# событие меняет её статус (тогда меняем и счётчик), иначе — обычный UPDATE.
+# Если в кэше уже те же значения, запросов нет. Возвращает True, если пользователь найден
+async def _update_with_counter(db: AsyncSession, user_id: int, values: dict, counter: str, condition, now_matches: bool):
+    cached = user_cache.peek_for(db, user_id)
+    if cached is not None and all(getattr(cached, name) == value for name, value in values.items()):
+        return True
+
+    transition = ~condition if now_matches else condition
+    result = await db.execute(update(User).where(User.user_id == user_id, transition).values(**values))
+    if result.rowcount > 0:
+        increment_counter(db, counter, 1 if now_matches else -1)
+    else:
+        result = await db.execute(update(User).where(User.user_id == user_id).values(**values))
+        if result.rowcount == 0:
+            return False
+
+    user_cache.stage(db, user_id, **values)
+    return True
+
+
+# Функция записи принятия Политики и Оферты. Возвращает True, если пользователь найден
+async def set_user_acceptance(db: AsyncSession, user_id: int, policy_accepted: bool, offer_accepted: bool):
+    return await _update_with_counter(
+        db, user_id,
+        {"policy_accepted": policy_accepted, "offer_accepted": offer_accepted},
+        "policy_accepted", ACCEPTED_CONDITION, bool(policy_accepted and offer_accepted)
+    )
+
+
+# Функция записи количества баллов и типа стратегии. Возвращает True, если пользователь найден
+async def set_strategy_type(db: AsyncSession, user_id: int, score: int, strategy_type: str):
+    return await _update_with_counter(
+        db, user_id,
+        {"score": score, "strategy_type": strategy_type},
+        "test_passed", TEST_PASSED_CONDITION, bool(score > 0 and strategy_type is not None)
+    )
+
+
+# Функция записи, что пользователь скачал гайд. Возвращает True, если гайд скачан впервые
+async def set_user_guide_downloaded(db: AsyncSession, user_id: int):
+    cached = user_cache.peek_for(db, user_id)
+    if cached is not None and cached.guide_downloaded:
+        return False
+
+    result = await db.execute(
+        update(User)
+        .where(User.user_id == user_id, User.guide_downloaded.isnot(True))
+        .values(guide_downloaded=True)
+    )
+    if result.rowcount > 0:
+        increment_counter(db, "guide_downloaded")
+        user_cache.stage(db, user_id, guide_downloaded=True)
+        return True
+    return False
+
+
+# Функция пакетного обновления last_interaction_date (один executemany на весь буфер)
+async def bulk_update_last_interaction_dates(db: AsyncSession, interactions: dict):
+    if not interactions:
+        return 0
+
+    stmt = (
+        update(User.__table__)
+        .where(User.__table__.c.user_id == bindparam("b_user_id"))
+        .values(last_interaction_date=bindparam("b_date"))
+    )
+    await db.execute(
+        stmt,
+        [{"b_user_id": user_id, "b_date": date} for user_id, date in interactions.items()]
     )
-    db.add(db_user)
     await db.commit()
-    await db.refresh(db_user)
-    return db_user
+    return len(interactions)
 
 
-# Функция для обновления записи пользователя, создание записи о принятии Политики и Оферты
-async def update_user_acceptance(db: AsyncSession, user_id: int, policy_accepted: bool, offer_accepted: bool):
-    # Ищем пользователя по user_id
-    result = await db.execute(select(User).filter(User.user_id == user_id))
-    user = result.scalars().first()
+# === Логика хранения состояний FSM ===
 
-    if user:
-        # Обновляем поля policy_accepted и offer_accepted
-        user.policy_accepted = policy_accepted
-        user.offer_accepted = offer_accepted
-        await db.commit()
-        await db.refresh(user)
-        return user
-    return None  # Если пользователь не найден
+# Загрузка состояния и данных FSM по ключу. Возвращает (state, data) или None
+async def get_fsm_state(db: AsyncSession, key: str):
+    result = await db.execute(select(FsmState.state, FsmState.data).where(FsmState.key == key))
+    return result.first()
 
 
-# Функция записи количества баллов и типа стратегии
-async def update_strategy_type(db: AsyncSession, user_id: int, score: int, strategy_type: str):
-    # Ищем пользователя по user_id
-    result = await db.execute(select(User).filter(User.user_id == user_id))
-    user = result.scalars().first()
+# Пакетная запись состояний FSM: rows — список словарей с ключами key, state, data
+async def save_fsm_states(db: AsyncSession, rows: list):
+    if rows:
+        now = datetime.utcnow()
+        stmt = _upsert(db, FsmState.__table__, ["key"], ["state", "data", "updated_at"])
+        await db.execute(stmt, [dict(row, updated_at=now) for row in rows])
 
-    if user:
-        # Обновляем поле strategy_type
-        user.strategy_type = strategy_type
-        user.score = score
-        await db.commit()
-        await db.refresh(user)
-        return user
-    return None  # Если пользователь не найден
 
+# Пакетное удаление пустых состояний FSM
+async def delete_fsm_states(db: AsyncSession, keys: list):
+    if keys:
+        await db.execute(delete(FsmState).where(FsmState.key.in_(keys)))
 
-# Функция записи, что пользователь скачал гайд
-async def update_user_guide_downloaded(db: AsyncSession, user_id: int):
-    # Проверяем, существует ли пользователь в базе данных
-    result = await db.execute(select(User).filter(User.user_id == user_id))
-    user = result.scalars().first()
 
-    if user:
-        # Обновляем поле guide_downloaded
-        user.guide_downloaded = True
-        await db.commit()
-        await db.refresh(user)
-        return user
-    return None  # Если пользователь не найден
+# === Ответы на тест ===
 
+# Пакетная запись ответов на тест одним INSERT (executemany).
+# rows — кортежи (user_id, quiz_version, question, option, answered_at), см. answer_buffer
+async def save_quiz_answers(db: AsyncSession, rows: list):
+    if not rows:
+        return 0
 
-# Функция обновления последнего взаимодействия пользователя с ботом
-async def update_last_interaction_date(db: AsyncSession, user_id: int):
-    # Получаем пользователя по user_id
-    result = await db.execute(select(User).filter(User.user_id == user_id))
-    user = result.scalars().first()
+    await db.execute(
+        insert(QuizAnswer.__table__),
+        [
+            {"user_id": user_id, "quiz_version": quiz_version, "question": question, "option": option, "answered_at": answered_at}
+            for user_id, quiz_version, question, option, answered_at in rows
+        ]
+    )
+    await db.commit()
+    return len(rows)
 
-    if user:
-        # Обновляем поле last_interaction_date
-        user.last_interaction_date = datetime.utcnow()
-        await db.commit()
-        await db.refresh(user)
-        return user
-    return None  # Если пользователь не найден
+
+# Сводка по ответам на тест одной версии: {номер вопроса: {"users": ответивших, "options": {вариант: ответов}}}.
+# Оба запроса читают только индекс ix_quiz_answers_version_question
+async def get_quiz_answer_stats(db: AsyncSession, quiz_version: int):
+    stats = {}
+
+    reached = await db.execute(
+        select(QuizAnswer.question, func.count(func.distinct(QuizAnswer.user_id)))
+        .where(QuizAnswer.quiz_version == quiz_version)
+        .group_by(QuizAnswer.question)
+    )
+    for question, users in reached:
+        stats[question] = {"users": users, "options": {}}
+
+    distribution = await db.execute(
+        select(QuizAnswer.question, QuizAnswer.option, func.count())
+        .where(QuizAnswer.quiz_version == quiz_version)
+        .group_by(QuizAnswer.question, QuizAnswer.option)
+    )
+    for question, option, answers in distribution:
+        stats.setdefault(question, {"users": 0, "options": {}})["options"][option] = answers
+
+    return stats
 
 
-# Пример получения пользователя из базы данных (асинхронно)
+# Получение пользователя через кэш: UserSnapshot (только чтение) или None.
+# Если пользователь изменён в незакоммиченной транзакции db, читаем её версию из базы мимо кэша
 async def get_user(db: AsyncSession, user_id: int):
-    result = await db.execute(select(User).filter(User.user_id == user_id))
-    user = result.scalars().first()
-    return user
+    if user_cache.is_staged(db, user_id):
+        return await _load_user_snapshot(db, user_id)
+    return await user_cache.get(user_id, lambda: _load_user_snapshot(db, user_id))
 
 # Пример работы с асинхронной сессией (для добавления пользователя и получения его данных)
 async def example_usage():
     async for db in get_db():
         # Добавление пользователя
-        user = await add_user(db, 1, 'John', 'Doe', 'john_doe', 'en')
-        print(f"User added: {user.first_name} {user.last_name}")
+        await upsert_user(db, 1, 'John', 'Doe', 'john_doe', 'en')
+        await db.commit()
+        user_cache.commit_tracked(db)
+        await apply_counter_deltas(db)
+        print("User added")
         
         # Получение пользователя
         retrieved_user = await get_user(db, 1)
@@ -186,7 +499,10 @@ async def example_usage():
 async def save_question_to_db(db, user_id, question_text):
     new_question = Question(user_id=user_id, question=question_text)
     db.add(new_question)
+    # Администраторы узнают о вопросе из уведомления (см. admin_notifier), до доставки admin_notified = False
+    await db.execute(update(User).where(User.user_id == user_id).values(has_asked_question=True, admin_notified=False))
     await db.commit()
+    user_cache.update(user_id, has_asked_question=True, admin_notified=False)
     await db.refresh(new_question)
     return new_question
 
@@ -209,32 +525,277 @@ async def get_answers_for_question(db, question_id):
     return await db.execute(select(Question).filter(Question.parent_question_id == question_id))
 
 
+# Уведомление о вопросах пользователей доставлено администраторам
+async def set_admin_notified(db: AsyncSession, question_ids: list, user_ids: list):
+    await db.execute(update(Question).where(Question.id.in_(question_ids)).values(admin_notified=True))
+    # Флаг автора означает «уведомлены обо всех его открытых вопросах»: вопрос, заданный
+    # уже после собранной сводки, остаётся неотмеченным вместе с флагом пользователя
+    waiting = select(Question.id).where(
+        Question.user_id == User.user_id, Question.answered == False, Question.admin_notified.is_not(True)
+    )
+    await db.execute(update(User).where(User.user_id.in_(user_ids), ~waiting.exists()).values(admin_notified=True))
+    await db.commit()
+    # Какие флаги поменялись, знает только база — кэш перечитает строки
+    for user_id in user_ids:
+        user_cache.invalidate(user_id)
+
+
+# Открытые вопросы, уведомления о которых администраторам ещё не доставлены (например, из-за перезапуска)
+async def get_unnotified_questions(db: AsyncSession):
+    query = (
+        select(Question.id, Question.user_id, Question.question, User.first_name, User.last_name, User.username)
+        .join(User, User.user_id == Question.user_id)
+        .where(Question.answered == False, Question.admin_notified.is_not(True))
+        .order_by(Question.id)
+    )
+    return (await db.execute(query)).all()
+
+
+# Страница открытых вопросов с именами авторов (одним запросом, keyset по id).
+# after_id — следующая страница (id > after_id), before_id — предыдущая (id < before_id).
+# Возвращает до limit строк по возрастанию id и признак, что в ту же сторону есть ещё
+async def get_open_questions_page(db: AsyncSession, after_id: int = None, before_id: int = None, limit: int = 10):
+    query = (
+        select(Question.id, Question.user_id, Question.question, User.first_name, User.last_name, User.username)
+        .outerjoin(User, User.user_id == Question.user_id)
+        .where(Question.answered == False)
+        .limit(limit + 1)
+    )
+    if before_id is not None:
+        query = query.where(Question.id < before_id).order_by(Question.id.desc())
+    else:
+        if after_id is not None:
+            query = query.where(Question.id > after_id)
+        query = query.order_by(Question.id)
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before_id is not None:
+        rows.reverse()
+    return rows, has_more
+
+
+async def count_open_questions(db: AsyncSession):
+    return await db.scalar(select(func.count()).select_from(Question).where(Question.answered == False))
+
+
+# === Логика кэша file_id для медиафайлов ===
+
+async def get_media_file(db: AsyncSession, path: str):
+    result = await db.execute(select(MediaFile.sha256, MediaFile.file_id).where(MediaFile.path == path))
+    return result.first()
+
+
+async def save_media_file(db: AsyncSession, path: str, sha256: str, file_id: str):
+    stmt = _upsert(db, MediaFile.__table__, ["path"], ["sha256", "file_id", "updated_at"])
+    await db.execute(stmt, {"path": path, "sha256": sha256, "file_id": file_id, "updated_at": datetime.utcnow()})
+    await db.commit()
+
+
+# === Логика работы с рассылками ===
+
+# Условия отбора пользователей по фильтру рассылки
+def _user_filter_clauses(filters: dict):
+    clauses = []
+    if "strategy_type" in filters:
+        clauses.append(User.strategy_type == filters["strategy_type"])
+    if "policy_accepted" in filters:
+        clauses.append(User.policy_accepted == filters["policy_accepted"])
+    if "guide_downloaded" in filters:
+        clauses.append(User.guide_downloaded == filters["guide_downloaded"])
+    if "test_passed" in filters:
+        passed = (User.score > 0) & (User.strategy_type.isnot(None))
+        clauses.append(passed if filters["test_passed"] else ~passed)
+    return clauses
+
+
+# Следующая страница получателей после after_user_id (keyset-пагинация по первичному ключу)
+async def get_recipient_batch(db: AsyncSession, filters: dict, after_user_id: int, limit: int):
+    result = await db.execute(
+        select(User.user_id)
+        .where(User.user_id > after_user_id, *_user_filter_clauses(filters))
+        .order_by(User.user_id)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+# Количество получателей по фильтру
+async def count_recipients(db: AsyncSession, filters: dict):
+    result = await db.execute(select(func.count()).select_from(User).where(*_user_filter_clauses(filters)))
+    return result.scalar_one()
+
+
+async def create_broadcast(db: AsyncSession, text: str, filters: str, created_by: int):
+    broadcast = Broadcast(text=text, filters=filters, created_by=created_by)
+    db.add(broadcast)
+    await db.commit()
+    return broadcast
+
+
+async def get_broadcast(db: AsyncSession, broadcast_id: int):
+    return await db.get(Broadcast, broadcast_id)
+
+
+async def get_running_broadcasts(db: AsyncSession):
+    result = await db.execute(select(Broadcast.id).where(Broadcast.status == "running"))
+    return result.scalars().all()
+
+
+# Обновление контрольной точки и счётчиков рассылки (значения счётчиков — приращения)
+async def update_broadcast_progress(db: AsyncSession, broadcast_id: int, cursor: int = None, sent: int = 0, failed: int = 0, blocked: int = 0, status: str = None):
+    values = {
+        "sent": Broadcast.sent + sent,
+        "failed": Broadcast.failed + failed,
+        "blocked": Broadcast.blocked + blocked,
+    }
+    if cursor is not None:
+        values["cursor"] = cursor
+    if status is not None:
+        values["status"] = status
+        if status != "running":
+            values["finished_at"] = datetime.utcnow()
+    await db.execute(update(Broadcast).where(Broadcast.id == broadcast_id).values(**values))
+    await db.commit()
+
+
 # === Логика работы со статистикой бота ===
 
-# Функция получения общей статистики по боту
+# Функция получения общей статистики по боту (чтение готовых счётчиков, без сканирования users)
 async def get_bot_statistics(db):
+    result = await db.execute(select(BotCounter.name, BotCounter.value).where(BotCounter.name.in_(BOT_COUNTERS)))
+    counters = dict(result.all())
+    return {name: counters.get(name, 0) for name in BOT_COUNTERS}
+
+
+# Функция подсчёта статистики по всей таблице users (для проверки и пересборки счётчиков)
+async def count_bot_statistics(db):
     result = await db.execute(
         select(
             func.count().label("total_users"),  # Общее количество пользователей
-            func.count().filter(
+            _count_if(
                 (User.policy_accepted == 1) & (User.offer_accepted == 1)
             ).label("policy_accepted"),  # Сколько приняли политику и офферту
-            func.count().filter(
+            _count_if(
                 (User.score > 0) & (User.strategy_type.isnot(None))
             ).label("test_passed"),  # Сколько прошли тест
-            func.count().filter(User.guide_downloaded == 1).label("guide_downloaded")  # Сколько скачали гайд
+            _count_if(User.guide_downloaded == 1).label("guide_downloaded")  # Сколько скачали гайд
         ).select_from(User)  # Запрос на таблицу пользователей
     )
 
-    stats = result.fetchone()  # Получаем результат запроса
+    stats = result.fetchone()  # Получаем результат запроса (MySQL отдаёт SUM как Decimal)
     return {
-        "total_users": stats[0],  # Общее количество пользователей
-        "policy_accepted": stats[1],  # Сколько приняли политику и офферту
-        "test_passed": stats[2],  # Сколько прошли тест
-        "guide_downloaded": stats[3],  # Сколько скачали гайд
+        "total_users": int(stats[0]),  # Общее количество пользователей
+        "policy_accepted": int(stats[1]),  # Сколько приняли политику и офферту
+        "test_passed": int(stats[2]),  # Сколько прошли тест
+        "guide_downloaded": int(stats[3]),  # Сколько скачали гайд
     }
 
 
+# Пересборка счётчиков с нуля по таблице users. Возвращает (было, стало) для сверки
+async def rebuild_bot_counters(db):
+    before = await get_bot_statistics(db)
+    actual = await count_bot_statistics(db)
+    stmt = _upsert(db, BotCounter.__table__, ["name"], ["value"])
+    await db.execute(stmt, [{"name": name, "value": value} for name, value in actual.items()])
+    await db.commit()
+    return before, actual
+
+
+# === Воронка и когорты ===
+
+# Пересчёт funnel_daily по пользователям, зарегистрированным начиная с since (None — за всё время).
+# GROUP BY по индексу registration_date, в Python приходят только строки сводки.
+# Строки пересчитываемых дней заменяются целиком: пары (день, язык), в которых
+# не осталось пользователей (сменили язык), из сводки пропадают
+async def refresh_funnel_daily(db: AsyncSession, since: datetime = None):
+    day = func.date(User.registration_date)
+    language = func.coalesce(User.language_code, "")
+    query = (
+        select(
+            day.label("day"),
+            language.label("language_code"),
+            func.count().label("users"),
+            _count_if(ACCEPTED_CONDITION).label("policy_accepted"),
+            _count_if(TEST_PASSED_CONDITION).label("test_passed"),
+            _count_if(User.guide_downloaded.is_(True)).label("guide_downloaded"),
+        )
+        .where(User.registration_date.isnot(None))
+        .group_by(day, language)
+    )
+    if since is not None:
+        query = query.where(User.registration_date >= since)
+
+    now = datetime.utcnow()
+    rows = []
+    for row in (await db.execute(query)).mappings():
+        row = dict(row, updated_at=now)
+        # SQLite возвращает DATE() строкой
+        if isinstance(row["day"], str):
+            row["day"] = date.fromisoformat(row["day"])
+        rows.append(row)
+
+    stale = delete(FunnelDaily)
+    if since is not None:
+        stale = stale.where(FunnelDaily.day >= since.date())
+    await db.execute(stale)
+    if rows:
+        await db.execute(insert(FunnelDaily.__table__), rows)
+    await db.commit()
+    return len(rows)
+
+
+# Есть ли в funnel_daily хоть одна строка (иначе нужен полный пересчёт)
+async def has_funnel_daily(db: AsyncSession):
+    result = await db.execute(select(FunnelDaily.day).limit(1))
+    return result.first() is not None
+
+
+FUNNEL_COLUMNS = ("users", "policy_accepted", "test_passed", "guide_downloaded")
+
+
+# Воронка по дням регистрации и языкам начиная с since_day (строки сводки по первичному ключу):
+# список (день, язык, users, policy_accepted, test_passed, guide_downloaded)
+async def get_funnel_by_day(db: AsyncSession, since_day: date):
+    result = await db.execute(
+        select(FunnelDaily.day, FunnelDaily.language_code, *(getattr(FunnelDaily, name) for name in FUNNEL_COLUMNS))
+        .where(FunnelDaily.day >= since_day)
+        .order_by(FunnelDaily.day)
+    )
+    return result.all()
+
+
+# Воронка за всё время по языкам: список (язык, users, policy_accepted, test_passed, guide_downloaded)
+async def get_funnel_by_language(db: AsyncSession):
+    users = func.sum(FunnelDaily.users)
+    result = await db.execute(
+        select(FunnelDaily.language_code, *(func.sum(getattr(FunnelDaily, name)) for name in FUNNEL_COLUMNS))
+        .group_by(FunnelDaily.language_code)
+        .order_by(users.desc())
+    )
+    return result.all()
+
+
+# Активные пользователи по last_interaction_date: {дней: пользователей} для каждого периода из periods
+async def count_active_users(db: AsyncSession, periods: tuple = (1, 7, 30)):
+    now = datetime.utcnow()
+    result = await db.execute(
+        select(*(
+            _count_if(User.last_interaction_date >= now - timedelta(days=days))
+            for days in periods
+        ))
+        .where(User.last_interaction_date >= now - timedelta(days=max(periods)))
+    )
+    return {days: int(count) for days, count in zip(periods, result.one())}
+
+
+# Заполнение счётчиков при первом запуске (если каких-то строк ещё нет)
+async def ensure_bot_counters(db):
+    result = await db.execute(select(func.count()).select_from(BotCounter).where(BotCounter.name.in_(BOT_COUNTERS)))
+    if result.scalar_one() < len(BOT_COUNTERS):
+        await rebuild_bot_counters(db)
+
+
 # Функция получения данных о пользователе
 async def get_user_info_by_username(db, username: str):
     # Запрос к базе данных для получения информации о пользователе
@@ -246,7 +807,7 @@ async def get_user_info_by_username(db, username: str):
             User.strategy_type,
             User.score,
             User.guide_downloaded
-        ).where(func.lower(User.username) == func.lower(username))
+        ).where(User.username_lower == username.lower())  # Поиск по индексу ix_users_username_lower
     )
 
     user_info = result.fetchone()  # Получаем первый результат
@@ -263,6 +824,32 @@ async def get_user_info_by_username(db, username: str):
     return None  # Если пользователь не найден
 
 
+# === Выгрузка пользователей ===
+
+# Колонки выгрузки пользователей (порядок = порядок колонок CSV)
+EXPORT_COLUMNS = (
+    User.user_id, User.username, User.first_name, User.last_name, User.language_code,
+    User.registration_date, User.last_interaction_date, User.policy_accepted, User.offer_accepted,
+    User.score, User.strategy_type, User.guide_downloaded, User.has_asked_question,
+)
+
+
+# Потоковое чтение пользователей серверным курсором: отдаёт строки пачками по batch_size,
+# в памяти одновременно только одна пачка. Фильтры: тип стратегии и диапазон даты регистрации [date_from, date_to)
+async def stream_users(db: AsyncSession, strategy_type: str = None, date_from: datetime = None, date_to: datetime = None, batch_size: int = 5000):
+    query = select(*EXPORT_COLUMNS).order_by(User.user_id)
+    if strategy_type is not None:
+        query = query.where(User.strategy_type == strategy_type)
+    if date_from is not None:
+        query = query.where(User.registration_date >= date_from)
+    if date_to is not None:
+        query = query.where(User.registration_date < date_to)
+
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield rows
+
+
 
 
 
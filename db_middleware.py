@@ -0,0 +1,52 @@
+# db_middleware.py
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from database import async_session, apply_counter_deltas, discard_counter_deltas
+from user_cache import user_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+# Outer-middleware: одна сессия БД на весь апдейт Telegram.
+# Сессия передаётся в обработчики аргументом `db` и коммитится один раз в конце,
+# поэтому весь /start или шаг теста выполняется одной транзакцией.
+# Изменения пользователей попадают в кэш (user_cache) только после коммита, при откате отбрасываются.
+# Счётчики статистики (bot_counters) записываются после коммита отдельной короткой
+# транзакцией — общая строка счётчика не блокируется на время ответов обработчика.
+class DbSessionMiddleware(BaseMiddleware):
+    def __init__(self, session_pool=async_session):
+        self.session_pool = session_pool
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        # Соединение берётся из пула только при первом запросе внутри сессии
+        async with self.session_pool() as session:
+            data["db"] = session
+            try:
+                result = await handler(event, data)
+                await session.commit()
+                user_cache.commit_tracked(session)
+                try:
+                    await apply_counter_deltas(session)
+                except Exception as e:
+                    # Апдейт уже обработан: ошибка счётчиков не должна его ронять, счётчики
+                    # можно пересчитать rebuild_bot_counters()
+                    await session.rollback()
+                    logger.error(f"Не удалось обновить счётчики статистики: {e}")
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                # Откат или отмена: изменения пользователей и счётчиков из этой транзакции не применяются
+                user_cache.discard_tracked(session)
+                discard_counter_deltas(session)
+            return result
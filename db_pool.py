@@ -0,0 +1,132 @@
+# db_pool.py
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config.config import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+
+
+# Границы корзин гистограммы ожидания соединения, миллисекунды
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+# Ключ в info соединения пула: соединение открыто при текущей выдаче
+OPENED_KEY = "db_pool_opened"
+
+
+# Счётчики пула: сколько раз брали соединение, сколько ждали, сколько раз вышли за pool_size
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.connects = 0  # Выдач, для которых открывалось новое соединение с базой
+        self.waits = 0  # Выдач готового соединения из пула (по ним считается ожидание)
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.overflow_events = 0  # Открыто соединений сверх pool_size
+        self.timeouts = 0  # Не дождались соединения за pool_timeout
+
+    def record_wait(self, seconds: float):
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.histogram[bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+
+
+# Пул asyncio-драйверов с замером ожидания соединения и событий overflow.
+# Ожидание замеряется один раз на выдачу, в публичном connect(). Если при выдаче
+# открывалось новое соединение (событие пула "connect"), выдача считается в connects,
+# а не в ожидании: время подключения к серверу — не очередь пула.
+# Overflow — новое соединение, когда открытых (события "connect"/"close") уже больше pool_size.
+# Метрики переживают пересоздание пула (engine.dispose, инвалидация соединений)
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        self._opened = 0  # Открытых соединений с базой
+        self._listen(event.listen)
+
+    def _listen(self, subscribe):
+        subscribe(self, "connect", self._on_connect)
+        subscribe(self, "close", self._on_close)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self._opened += 1
+        connection_record.info[OPENED_KEY] = True
+        if self._opened > self.size():
+            self.metrics.overflow_events += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        self._opened -= 1
+
+    # recreate() копирует слушателей в новый пул, а свои он подписывает сам:
+    # на время копирования снимаем слушателей, привязанных к этому пулу
+    def recreate(self):
+        self._listen(event.remove)
+        try:
+            pool = super().recreate()
+        finally:
+            self._listen(event.listen)
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            self.metrics.record_wait(time.perf_counter() - started)
+            raise
+
+        metrics = self.metrics
+        metrics.checkouts += 1
+        if connection.info.pop(OPENED_KEY, False):
+            metrics.connects += 1
+        else:
+            metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+    def status(self) -> dict:
+        metrics = self.metrics
+        bounds = [f"<={bound}" for bound in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}"]
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": metrics.checkouts,
+            "connects": metrics.connects,
+            "wait_avg_ms": round(metrics.wait_total / metrics.waits * 1000, 2) if metrics.waits else 0.0,
+            "wait_max_ms": round(metrics.wait_max * 1000, 2),
+            "wait_histogram_ms": dict(zip(bounds, metrics.histogram)),
+            "overflow_events": metrics.overflow_events,
+            "timeouts": metrics.timeouts,
+        }
+
+
+# Параметры пула для create_async_engine по адресу базы.
+# SQLite: база в памяти остаётся на StaticPool (одно соединение — одна база),
+# для файла pre_ping и recycle не нужны — соединения не обрываются по таймауту сервера.
+# MySQL/PostgreSQL: pre_ping проверяет соединение перед выдачей, recycle закрывает его
+# раньше wait_timeout сервера — иначе после простоя первый запрос падает на мёртвом соединении
+def pool_options(database_url: str, pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW, timeout: float = DB_POOL_TIMEOUT) -> dict:
+    url = make_url(database_url)
+    options = {"poolclass": InstrumentedPool, "pool_size": pool_size, "max_overflow": max_overflow, "pool_timeout": timeout}
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return {}
+        return options
+    options.update(pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=DB_POOL_PRE_PING)
+    return options
+
+
+# Метрики пула движка (для /metrics и админ-панели)
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    if isinstance(pool, InstrumentedPool):
+        return pool.status()
+    return {"pool": type(pool).__name__, "status": pool.status()}
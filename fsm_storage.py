@@ -0,0 +1,139 @@
+# fsm_storage.py
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StorageKey, StateType
+
+from config.config import FSM_FLUSH_INTERVAL, FSM_CACHE_TTL, FSM_CACHE_SIZE
+from database import async_session, get_fsm_state, save_fsm_states, delete_fsm_states
+
+
+logger = logging.getLogger(__name__)
+
+
+# Хранилище FSM поверх существующего движка SQLAlchemy (таблица fsm_states).
+# Чтение идёт через кэш в памяти процесса, а запись откладывается и уходит
+# пакетом раз в flush_interval секунд, поэтому set_state/update_data на каждом
+# ответе теста не ждут базу данных. При flush_interval=0 запись синхронная —
+# это режим для нескольких процессов без «липкой» маршрутизации пользователей
+# (вместе с cache_ttl=0).
+class SQLAlchemyStorage(BaseStorage):
+    def __init__(
+        self,
+        session_pool=async_session,
+        key_builder: Optional[KeyBuilder] = None,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        cache_ttl: float = FSM_CACHE_TTL,
+        cache_size: int = FSM_CACHE_SIZE,
+    ):
+        self.session_pool = session_pool
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # key -> (state, data, loaded_at)
+        self._dirty = {}  # key -> (state, data), ещё не записанные в базу
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    # Текущая запись по ключу: сначала несохранённые изменения, затем кэш, затем база
+    async def _load(self, key: str):
+        if key in self._dirty:
+            return self._dirty[key]
+
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[2] < self.cache_ttl:
+            self._cache.move_to_end(key)
+            return cached[0], cached[1]
+
+        async with self.session_pool() as db:
+            row = await get_fsm_state(db, key)
+        record = (row.state, json.loads(row.data) if row.data else {}) if row else (None, {})
+        self._remember(key, *record)
+        return record
+
+    def _remember(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        self._cache[key] = (state, data, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _store(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        self._remember(key, state, data)
+        self._dirty[key] = (state, data)
+        if self.flush_interval <= 0:
+            await self.flush()
+        elif self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        _, data = await self._load(storage_key)
+        await self._store(storage_key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        state, _ = await self._load(storage_key)
+        await self._store(storage_key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self.key_builder.build(key))
+        return data.copy()
+
+    # Запись накопленных изменений: пустые записи удаляются, остальные — одним upsert
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+
+            batch, self._dirty = self._dirty, {}
+            rows = []
+            empty_keys = []
+            for key, (state, data) in batch.items():
+                if state is None and not data:
+                    empty_keys.append(key)
+                else:
+                    rows.append({"key": key, "state": state, "data": json.dumps(data, ensure_ascii=False)})
+
+            try:
+                async with self.session_pool() as db:
+                    await save_fsm_states(db, rows)
+                    await delete_fsm_states(db, empty_keys)
+                    await db.commit()
+            except Exception as e:
+                # Возвращаем изменения в очередь, не затирая более свежие
+                for key, record in batch.items():
+                    self._dirty.setdefault(key, record)
+                logger.error(f"Не удалось записать состояния FSM ({len(batch)} ключей): {e}")
+                return 0
+
+            return len(batch)
+
+    async def _run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+                if not self._dirty:
+                    break
+        finally:
+            self._task = None
+
+    # Вызывается диспетчером при остановке: дописываем всё, что осталось в памяти
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
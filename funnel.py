@@ -0,0 +1,144 @@
+# funnel.py
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from config.config import (
+    FUNNEL_REFRESH_INTERVAL, FUNNEL_REFRESH_DAYS, FUNNEL_FULL_REFRESH_INTERVAL, FUNNEL_CACHE_TTL, FUNNEL_WEEKS,
+)
+from database import (
+    async_session, refresh_funnel_daily, has_funnel_daily, get_funnel_by_day, get_funnel_by_language,
+    count_active_users,
+)
+
+
+logger = logging.getLogger(__name__)
+
+STEP_TITLES = ("/start", "Политика", "Тест", "Гайд")
+
+
+# Строка воронки: "120 → 80 (66%) → 50 (41%) → 20 (16%)"
+def format_funnel(values) -> str:
+    users = values[0] or 0
+    parts = [str(users)]
+    for value in values[1:]:
+        value = value or 0
+        parts.append(f"{value} ({value * 100 // users if users else 0}%)")
+    return " → ".join(parts)
+
+
+# Отчёт «Воронка и когорты» для админ-панели.
+# Данные берутся из дневной сводки funnel_daily, которую фоновая задача пересчитывает
+# за последние refresh_days дней регистрации (раньше пользователи почти не меняются),
+# а раз в full_refresh_interval секунд — полностью, чтобы подтянуть и старые когорты.
+# Готовый текст кэшируется на интервал cache_ttl секунд.
+class FunnelReport:
+    def __init__(
+        self,
+        session_pool=async_session,
+        refresh_interval: float = FUNNEL_REFRESH_INTERVAL,
+        refresh_days: int = FUNNEL_REFRESH_DAYS,
+        full_refresh_interval: float = FUNNEL_FULL_REFRESH_INTERVAL,
+        cache_ttl: int = FUNNEL_CACHE_TTL,
+        weeks: int = FUNNEL_WEEKS,
+    ):
+        self.session_pool = session_pool
+        self.refresh_interval = refresh_interval
+        self.refresh_days = refresh_days
+        self.full_refresh_interval = full_refresh_interval
+        self.cache_ttl = cache_ttl
+        self.weeks = weeks
+        self._cache = None  # (номер интервала, текст)
+        self._full_refreshed_at = None  # time.monotonic() последнего полного пересчёта
+        self._task = None
+
+    # Пересчёт сводки: за последние refresh_days дней или полностью (full=True и при пустой таблице)
+    async def refresh(self, full: bool = False):
+        async with self.session_pool() as db:
+            if full or not await has_funnel_daily(db):
+                since = None
+                self._full_refreshed_at = time.monotonic()
+            else:
+                # С начала дня, чтобы не перезаписать граничный день неполными данными
+                since = datetime.combine(datetime.utcnow().date() - timedelta(days=self.refresh_days), datetime.min.time())
+            rows = await refresh_funnel_daily(db, since)
+        self._cache = None
+        logger.debug(f"funnel_daily пересчитана: {rows} строк")
+        return rows
+
+    async def _build(self, db) -> str:
+        active = await count_active_users(db)
+
+        # Когорты — неделя регистрации с понедельника (даты в UTC, как registration_date) и язык
+        today = datetime.utcnow().date()
+        first_week = today - timedelta(days=today.weekday(), weeks=self.weeks - 1)
+        weeks = {}  # неделя -> {язык: воронка}
+        for day, language_code, *values in await get_funnel_by_day(db, first_week):
+            week = day - timedelta(days=day.weekday())
+            cohort = weeks.setdefault(week, {}).setdefault(language_code, [0] * len(values))
+            for i, value in enumerate(values):
+                cohort[i] += value or 0
+
+        languages = await get_funnel_by_language(db)
+        totals = [sum(row[i] or 0 for row in languages) for i in range(1, len(STEP_TITLES) + 1)]
+
+        lines = [
+            "📈 Воронка и когорты\n",
+            f"Активные пользователи: за день {active[1]}, за неделю {active[7]}, за 30 дней {active[30]}\n",
+            " → ".join(STEP_TITLES),
+            f"Всего: {format_funnel(totals)}\n",
+            "По неделям регистрации и языкам:",
+        ]
+        for week in sorted(weeks, reverse=True):
+            cohorts = weeks[week]
+            week_totals = [sum(values[i] for values in cohorts.values()) for i in range(len(STEP_TITLES))]
+            lines.append(f"{week:%d.%m}–{week + timedelta(days=6):%d.%m}: {format_funnel(week_totals)}")
+            for language_code, values in sorted(cohorts.items(), key=lambda item: -item[1][0]):
+                lines.append(f"  {language_code or '—'}: {format_funnel(values)}")
+        if not weeks:
+            lines.append("нет регистраций")
+
+        lines.append("\nПо языкам:")
+        for language_code, *values in languages:
+            lines.append(f"{language_code or '—'}: {format_funnel(values)}")
+
+        return "\n".join(lines)
+
+    # Текст отчёта, один расчёт на интервал кэша
+    async def get(self, db) -> str:
+        bucket = int(time.time() // self.cache_ttl)
+        if self._cache is None or self._cache[0] != bucket:
+            self._cache = (bucket, await self._build(db))
+        return self._cache[1]
+
+    async def _run(self):
+        while True:
+            # Первый проход после запуска тоже полный: перезапуски могут случаться чаще интервала
+            full = (
+                self._full_refreshed_at is None
+                or time.monotonic() - self._full_refreshed_at >= self.full_refresh_interval
+            )
+            try:
+                await self.refresh(full)
+            except Exception as e:
+                logger.error(f"Не удалось пересчитать funnel_daily: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    # Запуск фонового пересчёта (вызывается при старте диспетчера)
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Общий отчёт для админ-панели
+funnel_report = FunnelReport()
@@ -7,25 +7,16 @@ from aiogram.types import CallbackQuery, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config.bot_instance import bot
-from database import get_db, save_question_to_db, get_question_by_id, get_questions_by_user, Question
+from config.config import ADMIN_IDS
+from database import save_question_to_db, get_question_by_id, get_questions_by_user, Question
+from question_queue import question_queue
+from admin_notifier import admin_notifier
 
 
 
-# Настройка логирования
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),  # Логи в файл
-        logging.StreamHandler()  # Логи в консоль
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
@@ -37,10 +28,6 @@ class AdminResponse(StatesGroup):
     waiting_for_question = State()
     waiting_for_response = State()
 
-# ID администратора
-ADMIN_ID = 5389520473
-
-
 # === Вызов логики работы команды help ===
 @router.message(Command("help"))
 async def help_command(message: Message):
@@ -85,31 +72,16 @@ async def ask_question(callback_query: CallbackQuery, state: FSMContext):
 
 # === Обработка вопроса пользователя ===
 @router.message(AdminResponse.waiting_for_question, F.text != "Отмена")
-async def handle_question(message: Message, state: FSMContext):
+async def handle_question(message: Message, state: FSMContext, db: AsyncSession):
     user_id = message.from_user.id
     question_text = message.text
 
     # Сохраняем вопрос в базе данных
-    async for db in get_db():
-        question = await save_question_to_db(db, user_id, question_text)
-
-    # Создаём inline-кнопку для ответа
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="Ответить", callback_data=f"answer_{question.id}")]
-    ])
+    question = await save_question_to_db(db, user_id, question_text)
+    question_queue.invalidate()
 
-    # Отправляем сообщение администратору
-    try:
-        await bot.send_message(
-            chat_id=ADMIN_ID,
-            text=f"💬 Новый вопрос от пользователя {message.from_user.full_name} (ID: {user_id}, Question ID: {question.id}):\n\n{question_text}",
-            reply_markup=keyboard
-        )
-    except Exception as e:
-        logger.error(f"Ошибка при отправке вопроса администратору: {str(e)}")
-        await message.answer("Ошибка при отправке вопроса. Попробуйте позже.")
-        await state.clear()
-        return
+    # Уведомление администраторам: сразу или в сводке вместе с другими вопросами
+    admin_notifier.notify(question.id, user_id, message.from_user.full_name, question_text)
 
     # Подтверждение пользователю
     await message.answer(
@@ -124,37 +96,37 @@ async def handle_question(message: Message, state: FSMContext):
 
 
 # === Обработка команды /questions для администратора ===
-@router.message(Command("questions"), F.from_user.id == ADMIN_ID)
-async def list_questions(message: Message):
-    async for db in get_db():
-        # Получаем все открытые вопросы (answered = False)
-        result = await db.execute(select(Question).filter(Question.answered == False))
-        questions = result.scalars().all()
-
-        if not questions:
-            await message.answer("Нет активных вопросов.")
-            return
-
-        # Формируем сообщение со списком вопросов
-        response = "📋 Активные вопросы:\n\n"
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-        for question in questions:
-            user_name = f"User_{question.user_id}"  # Можно улучшить, достав имя из таблицы User
-            response += f"👤 {user_name} (ID: {question.user_id}, Question ID: {question.id}): {question.question[:50]}...\n"
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text=f"Ответить {user_name}", callback_data=f"answer_{question.id}")
-            ])
-
-        await message.answer(response, reply_markup=keyboard)
+@router.message(Command("questions"), F.from_user.id.in_(ADMIN_IDS))
+async def list_questions(message: Message, db: AsyncSession):
+    # Первая страница открытых вопросов (answered = False) с именами пользователей
+    screen = await question_queue.page(db)
+    await message.answer(screen.text, reply_markup=screen.reply_markup, parse_mode=None)
+
+
+# === Листание списка вопросов: курсор — id крайнего вопроса текущей страницы ===
+@router.callback_query(F.data.startswith("questions_after_") | F.data.startswith("questions_before_"))
+async def page_questions(callback: CallbackQuery, db: AsyncSession):
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer("Только администратор может отвечать на вопросы!", show_alert=True)
+        return
+
+    direction, cursor = callback.data.rsplit("_", 1)
+    if direction == "questions_after":
+        screen = await question_queue.page(db, after_id=int(cursor))
+    else:
+        screen = await question_queue.page(db, before_id=int(cursor))
+
+    await callback.message.edit_text(screen.text, reply_markup=screen.reply_markup, parse_mode=None)
+    await callback.answer()
 
 
 # === Обработка нажатия кнопки "Ответить" ===
 @router.callback_query(F.data.startswith("answer_"))
-async def handle_answer_button(callback: CallbackQuery, state: FSMContext):
+async def handle_answer_button(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     admin_id = callback.from_user.id
 
     # Проверяем, что это администратор
-    if admin_id != ADMIN_ID:
+    if admin_id not in ADMIN_IDS:
         await callback.answer("Только администратор может отвечать на вопросы!", show_alert=True)
         return
 
@@ -162,30 +134,29 @@ async def handle_answer_button(callback: CallbackQuery, state: FSMContext):
     question_id = int(callback.data.split("_")[1])
 
     # Проверяем, существует ли вопрос
-    async for db in get_db():
-        result = await db.execute(select(Question).filter(Question.id == question_id))
-        question = result.scalars().first()
-        if not question:
-            await callback.message.answer("Ошибка: вопрос не найден.")
-            await callback.answer()
-            return
-
-        # Сохраняем question_id в состоянии
-        await state.update_data(question_id=question_id, user_id=question.user_id)
-        await state.set_state(AdminResponse.waiting_for_response)
-
-        # Просим администратора ввести ответ
-        await callback.message.answer(f"Введите ответ для вопроса (ID: {question_id}):")
+    result = await db.execute(select(Question).filter(Question.id == question_id))
+    question = result.scalars().first()
+    if not question:
+        await callback.message.answer("Ошибка: вопрос не найден.")
         await callback.answer()
+        return
+
+    # Сохраняем question_id в состоянии
+    await state.update_data(question_id=question_id, user_id=question.user_id)
+    await state.set_state(AdminResponse.waiting_for_response)
+
+    # Просим администратора ввести ответ
+    await callback.message.answer(f"Введите ответ для вопроса (ID: {question_id}):")
+    await callback.answer()
 
 
 # === Обработка ответа администратора ===
-@router.message(AdminResponse.waiting_for_response, F.from_user.id == ADMIN_ID)
-async def process_admin_response(message: Message, state: FSMContext):
+@router.message(AdminResponse.waiting_for_response, F.from_user.id.in_(ADMIN_IDS))
+async def process_admin_response(message: Message, state: FSMContext, db: AsyncSession):
     admin_id = message.from_user.id
 
     # Проверяем, что это администратор
-    if admin_id != ADMIN_ID:
+    if admin_id not in ADMIN_IDS:
         await message.answer("Только администратор может отвечать на вопросы!")
         return
 
@@ -200,18 +171,17 @@ async def process_admin_response(message: Message, state: FSMContext):
         return
 
     # Сохраняем ответ в базе данных
-    async for db in get_db():
-        result = await db.execute(select(Question).filter(Question.id == question_id))
-        question = result.scalars().first()
-        if question:
-            question.answer = message.text
-            question.answered = True
-            await db.commit()
-            await db.refresh(question)
-        else:
-            await message.answer("Ошибка: вопрос не найден.")
-            await state.clear()
-            return
+    result = await db.execute(select(Question).filter(Question.id == question_id))
+    question = result.scalars().first()
+    if question:
+        question.answer = message.text
+        question.answered = True
+        await db.commit()
+        question_queue.invalidate()
+    else:
+        await message.answer("Ошибка: вопрос не найден.")
+        await state.clear()
+        return
 
     # Отправляем ответ пользователю
     try:
@@ -0,0 +1,36 @@
+# interaction_buffer.py
+from datetime import datetime
+
+from config.config import TOUCH_FLUSH_INTERVAL, TOUCH_FLUSH_THRESHOLD
+from database import bulk_update_last_interaction_dates
+from write_buffer import WriteBehindBuffer
+
+
+# Буфер отложенной записи даты последнего взаимодействия.
+# Хранит в памяти только последнюю отметку по каждому пользователю и сбрасывает
+# всё накопленное одним пакетным UPDATE.
+class InteractionBuffer(WriteBehindBuffer):
+    name = "last_interaction_date"
+
+    def __init__(self, flush_interval: float = TOUCH_FLUSH_INTERVAL, flush_threshold: int = TOUCH_FLUSH_THRESHOLD):
+        super().__init__(flush_interval, flush_threshold)
+
+    def _new_pending(self):
+        return {}  # user_id -> последняя отметка времени
+
+    # Отметить взаимодействие пользователя (без обращения к базе данных)
+    def touch(self, user_id: int, when: datetime = None):
+        self._pending[user_id] = when or datetime.utcnow()
+        self._added()
+
+    async def _write(self, db, batch):
+        await bulk_update_last_interaction_dates(db, batch)
+
+    # Возвращаем отметки в буфер, не затирая более свежие
+    def _restore(self, batch):
+        for user_id, date in batch.items():
+            self._pending.setdefault(user_id, date)
+
+
+# Общий экземпляр буфера для всех обработчиков
+interaction_buffer = InteractionBuffer()
@@ -0,0 +1,69 @@
+# logging_setup.py
+import os
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config.config import (
+    LOG_LEVEL, LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_CONSOLE, SQL_LOG_LEVEL, USER_LOG_LEVEL,
+)
+
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Логгер для данных пользователей (имя, username, язык). По умолчанию выключен
+USER_LOGGER = "bot.users"
+
+_listener = None
+
+
+# Настройка логирования всего процесса. Обработчики в event loop только кладут запись
+# в очередь; запись в файл (с ротацией по размеру) и в консоль делает поток QueueListener.
+def setup_logging(level: str = LOG_LEVEL, log_file: str = LOG_FILE, console: bool = LOG_CONSOLE):
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if log_file:
+        # Каталог логов (например, на примонтированном томе) может ещё не существовать
+        log_dir = os.path.dirname(log_file)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8",
+        )
+        handlers.append(file_handler)
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+
+    # SQL-запросы и данные пользователей включаются отдельно через переменные окружения
+    logging.getLogger("sqlalchemy.engine").setLevel(SQL_LOG_LEVEL)
+    logging.getLogger(USER_LOGGER).setLevel(USER_LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+# Запись оставшихся в очереди сообщений и остановка потока логирования
+def stop_logging():
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
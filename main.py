@@ -1,6 +1,3 @@
-import time
-time.sleep(7)
-
 import os
 import asyncio
 import logging
@@ -9,101 +6,69 @@ from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 from aiogram.types import BotCommand, CallbackQuery
 from aiogram.filters import Command
-from aiogram.types import (
-    Message,
-    ReplyKeyboardMarkup,
-    ReplyKeyboardRemove,
-    KeyboardButton,
-    InlineKeyboardMarkup,
-    InlineKeyboardButton,
-)
-from aiogram.types import FSInputFile
+from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.fsm.state import StatesGroup, State
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from logging_setup import setup_logging, USER_LOGGER
+from startup import run_startup, FirstUpdateTimerMiddleware
 from config.bot_instance import bot
 from dotenv import load_dotenv
-from database import create_tables, get_db, add_user, update_user_acceptance, update_strategy_type, update_user_guide_downloaded, update_last_interaction_date
-from config.setup_commands import set_bot_commands
+from database import upsert_user, set_user_acceptance, set_strategy_type, set_user_guide_downloaded
+from interaction_buffer import interaction_buffer
+from answer_buffer import answer_buffer
+from consent_store import consent_store, POLICY, OFFER, ALL_ACCEPTED
+from screens import policy_keyboard, NEXT_ACTIONS_SCREEN
+from quiz_engine import quiz, Step
 from help_handler import router as help_router
 from admin_panel import router as admin_router
-
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),  # Логи в файл
-        logging.StreamHandler()  # Логи в консоль
-    ]
-)
+from db_middleware import DbSessionMiddleware
+from throttling import throttling_middleware
+from fsm_storage import SQLAlchemyStorage
+from broadcast import broadcast_engine
+from funnel import funnel_report
+from admin_notifier import admin_notifier
+from outbound import outbound_scheduler
+from media_cache import media_cache
+from config.config import FSM_STORAGE, BOT_MODE
+from webhook import run_webhook
+
+
+# Настройка логирования: запись в файл и консоль в отдельном потоке
+setup_logging()
 logger = logging.getLogger(__name__)
+user_logger = logging.getLogger(USER_LOGGER)
 
 # Загружаем переменные из файла .env
 load_dotenv()
 
 
 
-# === FSM состояния ===
-class Test(StatesGroup):
-    Q1 = State()
-    Q2 = State()
-    Q3 = State()
-    Q4 = State()
-    Q5 = State()
-    Q6 = State()
-    Q7 = State()
-
 # === Router ===
 router = Router()
 
 
-# Функция для создания клавиатуры с галочками и кнопкой "Принять"
-def create_policy_keyboard(accepted_policy=False, accepted_offer=False):
-    policy_text = "✅ Политика конфиденциальности" if accepted_policy else "☐ Политика конфиденциальности"
-    offer_text = "✅ Публичная оферта" if accepted_offer else "☐ Публичная оферта"
-
-    # Создаем клавиатуру с кнопками
-    keyboard = [
-        [InlineKeyboardButton(text=policy_text, callback_data="accept_policy")],
-        [InlineKeyboardButton(text=offer_text, callback_data="accept_offer")],
-        [InlineKeyboardButton(text="Принять", callback_data="accept")]
-    ]
-    
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
-
-# Словарь для хранения состояния пользователя
-user_acceptance = {}
-
-
 # Обработчик для команды /start
 @router.message(Command("start"))
-async def start(message: Message, state: FSMContext):
+async def start(message: Message, state: FSMContext, db: AsyncSession):
     user_id = message.from_user.id
     first_name = message.from_user.first_name
     last_name = message.from_user.last_name
     username = message.from_user.username
     language_code = message.from_user.language_code
     
-    # Устанавливаем команды бота асинхронно
-    await set_bot_commands(bot, user_id)
-    
-    user_acceptance[user_id] = {"policy": False, "offer": False}
-    logger.info(f"Команда /start получена от пользователя с telegram_id: {user_id}. Состояние инициализировано.")
+    await consent_store.set(user_id, 0, state)
+    user_logger.info(f"Команда /start получена от пользователя с telegram_id: {user_id}. Состояние инициализировано.")
 
-    # Дополнительное логирование для проверки
-    logger.info(f"Имя пользователя: {first_name}, Фамилия: {last_name}, Username: {username}, telegram_id: {user_id}, Язык: {language_code}")
+    # Данные пользователя пишутся в лог только при USER_LOG_LEVEL=INFO
+    user_logger.info(f"Имя пользователя: {first_name}, Фамилия: {last_name}, Username: {username}, telegram_id: {user_id}, Язык: {language_code}")
 
-    # Подключаем базу данных
-    async for db in get_db():
-        # Добавляем пользователя в базу данных
-        await add_user(db, user_id, first_name, last_name, username, language_code)
+    # Добавляем пользователя в базу данных (сессия открыта DbSessionMiddleware)
+    await upsert_user(db, user_id, first_name, last_name, username, language_code)
 
     # Обновляем дату последнего взаимодействия
-    async for db in get_db():
-        await update_last_interaction_date(db, user_id)
+    interaction_buffer.touch(user_id)
     
     policy_url = "http://45.130.214.36:8000/static/policy.html"
     terms_url = "http://45.130.214.36:8000/static/terms.html"
@@ -114,194 +79,107 @@ async def start(message: Message, state: FSMContext):
         f"[Политика конфиденциальности]({policy_url})\n"
         f"[Публичная оферта]({terms_url})"
     )
-    await message.answer(text, parse_mode="Markdown", reply_markup=create_policy_keyboard())
+    await message.answer(text, parse_mode="Markdown", reply_markup=policy_keyboard())
 
 
 # Обработка нажатий на кнопки политики и оферты
 @router.callback_query(lambda callback_query: callback_query.data in ["accept_policy", "accept_offer"])
-async def process_policy_offer(callback_query: CallbackQuery, bot: Bot):
+async def process_policy_offer(callback_query: CallbackQuery, state: FSMContext, bot: Bot):
     user_id = callback_query.from_user.id
-    if user_id not in user_acceptance:
-        user_acceptance[user_id] = {"policy": False, "offer": False}
 
     # Обновляем состояние в зависимости от нажатой кнопки
-    if callback_query.data == "accept_policy":
-        user_acceptance[user_id]["policy"] = not user_acceptance[user_id]["policy"]
-    elif callback_query.data == "accept_offer":
-        user_acceptance[user_id]["offer"] = not user_acceptance[user_id]["offer"]
+    flag = POLICY if callback_query.data == "accept_policy" else OFFER
+    flags = await consent_store.toggle(user_id, flag, state)
 
     # Обновляем клавиатуру
     await bot.edit_message_reply_markup(
         chat_id=callback_query.message.chat.id,
         message_id=callback_query.message.message_id,
-        reply_markup=create_policy_keyboard(
-            accepted_policy=user_acceptance[user_id]["policy"],
-            accepted_offer=user_acceptance[user_id]["offer"]
-        )
+        reply_markup=policy_keyboard(flags)
     )
     await callback_query.answer()
 
 
 # Обработка кнопки "Принять"
 @router.callback_query(lambda callback_query: callback_query.data == "accept")
-async def process_accept(callback_query: CallbackQuery, state: FSMContext):
+async def process_accept(callback_query: CallbackQuery, state: FSMContext, db: AsyncSession):
     user_id = callback_query.from_user.id
     
     # Проверяем, что пользователь уже начал процесс принятия условий
-    if user_id in user_acceptance and user_acceptance[user_id]["policy"] and user_acceptance[user_id]["offer"]:
+    if await consent_store.get(user_id, state) == ALL_ACCEPTED:
         # Обновляем информацию о принятии условий в базе данных
-        async for db in get_db():
-            await update_user_acceptance(db, user_id, True, True)  # Обновляем статус принятия политики и оферты
+        await set_user_acceptance(db, user_id, True, True)  # Обновляем статус принятия политики и оферты
 
         # Обновляем дату последнего взаимодействия
-        async for db in get_db():
-            await update_last_interaction_date(db, user_id)
+        interaction_buffer.touch(user_id)
         
+        # Отметки больше не нужны: данные FSM очистит start_next
+        consent_store.discard(user_id)
+
         await callback_query.message.answer("Спасибо за доверие. Вы приняли условия.\nПриступим к тесту.")
         await start_next(callback_query.message, state)
     else:
         await callback_query.answer("Пожалуйста, примите оба документа, чтобы продолжить.", show_alert=True)
 
 
-# === Карта баллов ===
-score_map = {"а": 1, "б": 2, "в": 3, "г": 4}
-
-questions = {
-    Test.Q2: "2️⃣ Был ли у вас опыт потерь в криптовалютах?",
-    Test.Q3: "3️⃣ Насколько вам комфортно наблюдать волатильность 10–30%?",
-    Test.Q4: "4️⃣ Случалось ли вам покупать актив из-за эмоций, FOMO?",
-    Test.Q5: "5️⃣ Какой у вас опыт в криптовалютах?",
-    Test.Q6: "6️⃣ Как вы подходите к выбору монет для инвестиций?",
-    Test.Q7: "7️⃣ Насколько вам комфортно использовать заемные средства (плечо)?"
-}
-
-answers = [
-    [
-        "а) Нет, я только начинаю",
-        "б) Да, и это было очень неприятно",
-        "в) Да, сделал выводы",
-        "г) Да, и воспринимаю это как опыт"
-    ],
-    [
-        "а) Это вызывает стресс",
-        "б) Немного напрягает",
-        "в) Привык, воспринимаю спокойно",
-        "г) Чем выше волатильность — тем интереснее"
-    ],
-    [
-        "а) Да, регулярно",
-        "б) Иногда, стараюсь сдерживаться",
-        "в) Редко, чаще по плану",
-        "г) Нет, всегда по анализу"
-    ],
-    [
-        "а) Меньше 6 месяцев",
-        "б) До 1 года",
-        "в) 1–2 года",
-        "г) Более 2 лет"
-    ],
-    [
-        "а) Следую за трендом",
-        "б) Смотрю график",
-        "в) Анализирую волатильность и ликвидность",
-        "г) Глубокий фундаментальный анализ"
-    ],
-    [
-        "а) Не использую и не хочу",
-        "б) Только минимальное",
-        "в) Использую с пониманием",
-        "г) Комфортно использую высокое плечо"
-    ]
-]
-
 # === Старт теста ===
 async def start_next(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Очищаем состояние и устанавливаем начальные данные
     await state.clear()
-    await state.update_data(score=0)
+    await state.update_data(score=0, quiz_version=quiz.version)
     
     # Устанавливаем состояние для первого вопроса
-    await state.set_state(Test.Q1)
+    await state.set_state(quiz.first_step.state)
     
     # Обновляем дату последнего взаимодействия
-    async for db in get_db():
-        await update_last_interaction_date(db, user_id)
+    interaction_buffer.touch(user_id)
     
     # Отправляем первый вопрос с кнопками
-    await message.answer(
-        "Привет! Давай определим твой риск-профиль на крипторынке.\n\n"
-        "1️⃣ Как вы себя чувствуете, когда цена актива падает на 30% за короткий срок?",
-        reply_markup=ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="а) Хочу всё продать и выйти из рынка")],
-                [KeyboardButton(text="б) Испытываю тревогу, но продолжаю наблюдать")],
-                [KeyboardButton(text="в) Понимаю, что такое может быть")],
-                [KeyboardButton(text="г) Вижу возможность для нового входа")],
-            ],
-            resize_keyboard=True
-        )
-    )
+    screen = quiz.first_step.screen
+    await message.answer(screen.text, reply_markup=screen.reply_markup)
 
 
-# === Q1 ===
-@router.message(Test.Q1, F.text.startswith(("а", "б", "в", "г")))
-async def handle_q1(message: Message, state: FSMContext):
-    user_id = message.from_user.id
-    
-    score = score_map.get(message.text[:1].lower(), 0)
-    await state.update_data(score=score)
-    await state.set_state(Test.Q2)
-    q_text = questions[Test.Q2]
-    a_buttons = answers[0]
-    
-    # Обновляем дату последнего взаимодействия
-    async for db in get_db():
-        await update_last_interaction_date(db, user_id)
-    
-    await message.answer(q_text, reply_markup=ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=opt)] for opt in a_buttons],
-        resize_keyboard=True
-    ))
-
-# === Q2–Q7 ===
-@router.message(F.text.startswith(("а", "б", "в", "г")))
-async def handle_question(message: Message, state: FSMContext):
+# Фильтр: пользователь на вопросе теста и выбрал один из вариантов.
+# Шаг и вариант передаются в обработчик; остальные сообщения (например, /help) идут дальше
+def quiz_answer(message: Message, raw_state: str):
+    step = quiz.steps.get(raw_state)
+    if step is None or not message.text:
+        return False
+    option = quiz.option(step, message.text)
+    if option is None:
+        return False
+    return {"step": step, "option": option}
+
+
+# === Ответ на вопрос теста ===
+@router.message(quiz_answer)
+async def handle_question(message: Message, state: FSMContext, step: Step, option: tuple, db: AsyncSession):
     user_id = message.from_user.id
-    
+    option_number, points = option
+
     state_data = await state.get_data()
-    score = state_data.get("score", 0)
-    score += score_map.get(message.text[:1].lower(), 0)
-    await state.update_data(score=score)
+    score = state_data.get("score", 0) + points
 
-    current_state = await state.get_state()
-    states = list(questions.keys())
+    # Ответ уходит в буфер, в базу — пакетом вместе с ответами других пользователей
+    answer_buffer.add(user_id, state_data.get("quiz_version", quiz.version), step.index, option_number)
 
-    try:
-        current_index = states.index(getattr(Test, current_state.split(":")[-1]))
-    except ValueError:
-        return
+    # Обновляем дату последнего взаимодействия
+    interaction_buffer.touch(user_id)
 
-    if current_state == Test.Q7.state:
+    if step.next_state is None:
         # Вместо вызова show_result, вызываем функцию удаления клавиатуры
-        await delete_keyboard(message, state, score)
-        
-        # Обновляем дату последнего взаимодействия
-        async for db in get_db():
-            await update_last_interaction_date(db, user_id)
-        
+        await delete_keyboard(message, state, score, db)
         await state.clear()
     else:
-        next_state = states[current_index + 1]
-        await state.set_state(next_state)
-        await message.answer(questions[next_state], reply_markup=ReplyKeyboardMarkup(
-            keyboard=[[KeyboardButton(text=opt)] for opt in answers[current_index + 1]],
-            resize_keyboard=True
-        ))
+        await state.update_data(score=score)
+        await state.set_state(step.next_state)
+        screen = quiz.steps[step.next_state].screen
+        await message.answer(screen.text, reply_markup=screen.reply_markup)
 
 
-async def delete_keyboard(message: Message, state: FSMContext, score: int):
+async def delete_keyboard(message: Message, state: FSMContext, score: int, db: AsyncSession):
     try:
         # Проверка на существование клавиатуры, удаляем её, если она есть
         if message.reply_markup:
@@ -312,98 +190,49 @@ async def delete_keyboard(message: Message, state: FSMContext, score: int):
         logger.warning(f"Не удалось удалить клавиатуру: {e}")
 
     # Теперь вызываем функцию для отображения результата
-    await show_result(message, score)
+    await show_result(message, score, db)
 
 
 # === Финальный результат и гайд ===
-async def show_result(message: Message, score: int):
+async def show_result(message: Message, score: int, db: AsyncSession):
     user_id = message.from_user.id
-    strategy_type = None
-    
-    if score <= 13:
-        result = """🟢 *Консервативная стратегия*
-                    Вы предпочитаете стабильность и контроль, не готовы рисковать значительной частью депозита.
-
-                    🔧 *Рекомендованная стратегия:*
-                    • Сетка: широкая (консервативная)
-                    • Тип торговли: только спот или фьючерсы с ISO-маржой
-                    • Плечо: от 1 до 3
-                    • Активы: монеты из *топ-50 CoinMarketCap* с высокой ликвидностью и историей
-                    • Цель: сохранить депозит, ориентированная доходность *5–10%/м*
-
-                    🛡 *Риск-менеджмент обязателен*: лимит убытка на цикл, ограниченное число ботов.
-                """
-        strategy_type = "Консервативная"
-    
-    elif score <= 21:
-        result = """🟡 *Умеренная стратегия*
-                    Вы открыты к риску, но хотите держать ситуацию под контролем.
-
-                    🔧 *Рекомендованная стратегия:*
-                    • Сетка: умеренная, консервативная
-                    • Маржа: *ISO или Cross*, в зависимости от фазы рынка и волатильности
-                    • Плечо: от 1 до 5
-                    • Активы: криптовалюты из *топ-100 до топ-200 CMC*
-                    • Цель: баланс доходности и рисков, работа в *обе стороны (лонг/шорт)* с фильтрацией тренда
-
-                    ⚖️ Подходит для трейдеров, осознанно управляющих рисками и понимающих фазу рынка.
-                """
-        strategy_type = "Умеренная"
-    
-    else:
-        result = """🔴 *Агрессивная стратегия*
-                    Вы — трейдер с высокой терпимостью к риску. Вас не пугает волатильность, вы охотно заходите в быстро меняющиеся рыночные ситуации.
-
-                    🔥 *Рекомендованная стратегия:*
-                    • Сетка: *агрессивная и умеренная ширина*
-                    • Маржа: *Cross*
-                    • Плечо: от 5 до 10
-                    • Активы: любые монеты CMC, соответствующие критериям *волатильности, ликвидности, объёма*
-                    • Примеры: свежие листинги, памповые/дамповые активы
-                    • Цель: высокая доходность *20–40% в месяц*
-
-                    ⚠️ Требуется *ручное управление и частое взаимодействие с ботами*.
-                """
-        strategy_type = "Агрессивная"
+    profile = quiz.profile(score)
 
     # Отправляем результат пользователю
-    await message.answer(f"✅ *Тест завершён!* Вот твой результат:\n\n{result}", reply_markup=ReplyKeyboardRemove(), parse_mode="Markdown")
+    await message.answer(profile.screen.text, reply_markup=profile.screen.reply_markup, parse_mode="Markdown")
     
-    # Подключаем базу данных и обновляем тип стратегии
-    async for db in get_db():
-        await update_strategy_type(db, user_id, score, strategy_type)
+    # Обновляем тип стратегии
+    await set_strategy_type(db, user_id, score, profile.strategy_type)
     
     # Обновляем дату последнего взаимодействия
-    async for db in get_db():
-        await update_last_interaction_date(db, user_id)
+    interaction_buffer.touch(user_id)
     
     # Кнопки: скачать гайд + пройти заново
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📘 Скачать гайд", callback_data="download_guide")],
-        [InlineKeyboardButton(text="🔁 Пройти тест заново", callback_data="restart_test")]
-    ])
-    await message.answer("Что хочешь сделать дальше?", reply_markup=keyboard)
+    await message.answer(NEXT_ACTIONS_SCREEN.text, reply_markup=NEXT_ACTIONS_SCREEN.reply_markup)
 
 # === Обработка кнопок ===
 
 # === Обработка кнопки "Скачать гайд" ===
 @router.callback_query(F.data == "download_guide")
-async def send_guide(callback: CallbackQuery):
-    file_path = "Guide_RM_MM.pdf"
-    input_file = FSInputFile(path=file_path, filename="Guide_RM_MM.pdf")
-    await callback.message.answer_document(input_file, caption="📘 *Скачай гайд по настройке грид-ботов!*", parse_mode="Markdown")
+async def send_guide(callback: CallbackQuery, db: AsyncSession):
+    # Гайд загружается в Telegram один раз, дальше отправляется по сохранённому file_id
+    await media_cache.send(
+        callback.bot,
+        callback.message.chat.id,
+        "Guide_RM_MM.pdf",
+        caption="📘 *Скачай гайд по настройке грид-ботов!*",
+        parse_mode="Markdown"
+    )
     
     # Подтверждаем обработку запроса
     await callback.answer()
     
     # Обновляем базу данных, что пользователь скачал гайд
     user_id = callback.from_user.id
-    async for db in get_db():
-        await update_user_guide_downloaded(db, user_id)  # Обновляем статус скачивания гайда
+    await set_user_guide_downloaded(db, user_id)  # Обновляем статус скачивания гайда
     
     # Обновляем дату последнего взаимодействия
-    async for db in get_db():
-        await update_last_interaction_date(db, user_id)
+    interaction_buffer.touch(user_id)
 
 
 @router.callback_query(F.data == "restart_test")
@@ -414,15 +243,51 @@ async def restart(callback: Message, state: FSMContext):
 
 # === Запуск бота ===
 async def main():
-    # Инициализация базы данных (создание таблиц)
-    await create_tables()  # Убедитесь, что таблицы созданы перед запуском бота
-    
-    dp = Dispatcher(storage=MemoryStorage())
+    # Ожидание БД с backoff, миграции, прогрев пула и команды бота (вместо фиксированной паузы)
+    await run_startup(bot)
+
+    # Состояния теста храним в базе данных, чтобы они переживали перезапуск
+    storage = SQLAlchemyStorage() if FSM_STORAGE == "sql" else MemoryStorage()
+
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(FirstUpdateTimerMiddleware())
+    # Лимит апдейтов на пользователя и подавление повторных нажатий — до открытия сессии БД
+    dp.update.outer_middleware(throttling_middleware)
+    # Одна сессия БД на апдейт, коммит в конце обработки
+    dp.update.outer_middleware(DbSessionMiddleware())
     dp.include_router(router)
     dp.include_router(help_router)
     dp.include_router(admin_router)
+
+    # Буфер last_interaction_date: фоновый сброс и финальная запись при остановке
+    dp.startup.register(interaction_buffer.start)
+    dp.shutdown.register(interaction_buffer.stop)
+
+    # Буфер ответов на тест: пакетная запись в quiz_answers
+    dp.startup.register(answer_buffer.start)
+    dp.shutdown.register(answer_buffer.stop)
+
+    # Рассылки: продолжение прерванных при старте, остановка с сохранением контрольной точки
+    dp.startup.register(broadcast_engine.resume)
+    dp.shutdown.register(broadcast_engine.stop)
+
+    # Фоновый пересчёт сводки воронки для админ-панели
+    dp.startup.register(funnel_report.start)
+    dp.shutdown.register(funnel_report.stop)
+
+    # Уведомления администраторам о вопросах: недоставленные до перезапуска и сводка при остановке
+    dp.startup.register(admin_notifier.start)
+    dp.shutdown.register(admin_notifier.stop)
+
+    # Досылаем очередь исходящих сообщений перед остановкой
+    dp.shutdown.register(outbound_scheduler.stop)
     
-    await dp.start_polling(bot)
+    # Режим получения апдейтов задаётся переменной BOT_MODE
+    if BOT_MODE == "webhook":
+        await run_webhook(dp, bot)
+    else:
+        await bot.delete_webhook()  # Telegram не отдаёт апдейты через getUpdates при активном вебхуке
+        await dp.start_polling(bot)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,98 @@
+# media_cache.py
+import os
+import asyncio
+import hashlib
+import logging
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+
+from database import async_session, get_media_file, save_media_file
+
+
+logger = logging.getLogger(__name__)
+
+
+# Метод Bot API и способ достать file_id из ответа для каждого типа файла
+MEDIA_KINDS = {
+    "document": ("send_document", lambda message: message.document.file_id),
+    "photo": ("send_photo", lambda message: message.photo[-1].file_id),
+    "video": ("send_video", lambda message: message.video.file_id),
+    "audio": ("send_audio", lambda message: message.audio.file_id),
+    "animation": ("send_animation", lambda message: message.animation.file_id),
+}
+
+
+# Кэш file_id для статических файлов бота (гайд и т.п.).
+# Файл загружается в Telegram один раз, дальше отправляется по file_id.
+# file_id хранится в таблице media_files вместе с sha256 содержимого и
+# сбрасывается, как только хэш файла на диске меняется.
+class MediaCache:
+    def __init__(self, session_pool=async_session):
+        self.session_pool = session_pool
+        self._file_ids = {}  # path -> (sha256, file_id)
+        self._hashes = {}  # path -> (mtime_ns, size, sha256), чтобы не хэшировать файл на каждую отправку
+        self._locks = {}  # path -> asyncio.Lock, чтобы не загружать файл параллельно
+
+    async def _sha256(self, path: str):
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        def compute():
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            return digest.hexdigest()
+
+        sha256 = await asyncio.to_thread(compute)
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, sha256)
+        return sha256
+
+    async def _cached_file_id(self, path: str, sha256: str):
+        cached = self._file_ids.get(path)
+        if cached is None:
+            async with self.session_pool() as db:
+                row = await get_media_file(db, path)
+            if row is None:
+                return None
+            cached = self._file_ids[path] = (row.sha256, row.file_id)
+        return cached[1] if cached[0] == sha256 else None
+
+    # Отправка файла в чат: по file_id, если он есть для текущей версии файла, иначе загрузка
+    async def send(self, bot, chat_id: int, path: str, kind: str = "document", filename: str = None, **kwargs):
+        method_name, extract_file_id = MEDIA_KINDS[kind]
+        send_method = getattr(bot, method_name)
+        sha256 = await self._sha256(path)
+
+        file_id = await self._cached_file_id(path, sha256)
+        if file_id:
+            try:
+                return await send_method(chat_id, file_id, **kwargs)
+            except TelegramBadRequest as e:
+                # file_id больше не принимается (например, сменился бот) — загружаем заново
+                logger.warning(f"file_id для {path} отклонён Telegram, загружаем файл заново: {e}")
+                self._file_ids[path] = (None, None)
+
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            # Пока ждали блокировку, файл мог загрузить параллельный запрос
+            file_id = await self._cached_file_id(path, sha256)
+            if file_id:
+                return await send_method(chat_id, file_id, **kwargs)
+
+            input_file = FSInputFile(path=path, filename=filename or os.path.basename(path))
+            message = await send_method(chat_id, input_file, **kwargs)
+
+            file_id = extract_file_id(message)
+            self._file_ids[path] = (sha256, file_id)
+            async with self.session_pool() as db:
+                await save_media_file(db, path, sha256, file_id)
+            logger.info(f"Файл {path} загружен в Telegram, file_id сохранён")
+            return message
+
+
+# Общий экземпляр кэша медиафайлов
+media_cache = MediaCache()
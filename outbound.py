@@ -0,0 +1,222 @@
+# outbound.py
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from enum import IntEnum
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from config.config import (
+    OUTBOUND_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_WORKERS, OUTBOUND_MAX_RETRIES,
+)
+from rate_limit import TokenBucket, KeyedTokenBuckets
+
+
+logger = logging.getLogger(__name__)
+
+
+# Приоритеты отправки: меньше — раньше
+class Lane(IntEnum):
+    INTERACTIVE = 0  # Ответы пользователю в обработчиках
+    NOTIFY = 1  # Уведомления администраторам
+    BULK = 2  # Рассылки
+
+
+_current_lane = ContextVar("outbound_lane", default=Lane.INTERACTIVE)
+
+
+# Все запросы к Bot API внутри блока уходят с указанным приоритетом
+@contextmanager
+def lane(value: Lane):
+    token = _current_lane.set(value)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+# Центральный планировщик исходящих запросов: очередь с приоритетами, общий и
+# поканальный token bucket, повтор после TelegramRetryAfter и метрики по каждому приоритету.
+#
+# Воркер не ждёт поканальный bucket: если лимит чата исчерпан, запрос уходит в очередь
+# ожидания этого чата (_held), а воркер берёт следующий запрос. В общую очередь из очереди
+# чата по таймеру возвращается только первый запрос — так один чат с длинной очередью
+# не занимает воркеров и не задерживает отправку в другие чаты.
+class OutboundScheduler:
+    def __init__(
+        self,
+        rate: float = OUTBOUND_RATE,
+        chat_rate: float = OUTBOUND_CHAT_RATE,
+        chat_burst: float = OUTBOUND_CHAT_BURST,
+        workers: int = OUTBOUND_WORKERS,
+        max_retries: int = OUTBOUND_MAX_RETRIES,
+    ):
+        self.global_bucket = TokenBucket(rate)
+        self.chat_buckets = KeyedTokenBuckets(chat_rate, chat_burst)
+        self.workers = workers
+        self.max_retries = max_retries
+        self._queue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._held = {}  # chat_id -> куча запросов, ждущих лимита чата
+        self._tasks = []
+        self._metrics = {
+            item: {"sent": 0, "failed": 0, "retried": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for item in Lane
+        }
+        self._retry_after_seconds = 0.0
+
+    def _ensure_workers(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    # Поставить запрос в очередь. call — функция без аргументов, возвращающая корутину запроса
+    def submit(self, call, chat_id: int, priority: Lane = None) -> asyncio.Future:
+        self._ensure_workers()
+        priority = _current_lane.get() if priority is None else priority
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((priority, next(self._sequence), chat_id, call, future, time.monotonic(), 0, False))
+        return future
+
+    # Поставить запрос в очередь и дождаться результата
+    async def send(self, call, chat_id: int, priority: Lane = None):
+        return await self.submit(call, chat_id, priority)
+
+    # Через delay секунд вернуть первый запрос из очереди чата в общую очередь
+    def _release_later(self, chat_id: int, delay: float):
+        asyncio.get_running_loop().call_later(delay, self._release, chat_id)
+
+    def _release(self, chat_id: int):
+        held = self._held.get(chat_id)
+        if not held:
+            self._held.pop(chat_id, None)
+            return
+        item = heapq.heappop(held)
+        self._queue.put_nowait(item[:-1] + (True,))
+
+    # Запрос чата обработан: следующий из его очереди проверит лимит сам
+    def _advance(self, chat_id: int):
+        held = self._held.get(chat_id)
+        if held:
+            self._release_later(chat_id, 0)
+        elif held is not None:
+            del self._held[chat_id]
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            priority, sequence, chat_id, call, future, enqueued_at, attempt, released = item
+            metrics = self._metrics[priority]
+            try:
+                held = self._held.get(chat_id)
+                if held is not None and not released:
+                    # Чат уже ждёт лимита: запрос встаёт в его очередь
+                    heapq.heappush(held, item)
+                    continue
+
+                if future.cancelled():
+                    if released:
+                        self._advance(chat_id)
+                    continue
+
+                delay = self.chat_buckets.get(chat_id).try_acquire()
+                if delay > 0:
+                    if held is None:
+                        held = self._held[chat_id] = []
+                    heapq.heappush(held, item)
+                    self._release_later(chat_id, delay)
+                    continue
+                if released:
+                    self._advance(chat_id)
+
+                await self.global_bucket.acquire()
+
+                if attempt == 0:
+                    waited = time.monotonic() - enqueued_at
+                    metrics["wait_total"] += waited
+                    metrics["wait_max"] = max(metrics["wait_max"], waited)
+
+                try:
+                    result = await call()
+                except TelegramRetryAfter as e:
+                    # Флуд-контроль Telegram действует на весь бот: приостанавливаем все отправки
+                    self.global_bucket.pause(e.retry_after)
+                    self._retry_after_seconds += e.retry_after
+                    if attempt < self.max_retries:
+                        metrics["retried"] += 1
+                        logger.warning(f"RetryAfter {e.retry_after} с для чата {chat_id}, повтор {attempt + 1}")
+                        self._queue.put_nowait((priority, sequence, chat_id, call, future, enqueued_at, attempt + 1, False))
+                    else:
+                        metrics["failed"] += 1
+                        if not future.done():
+                            future.set_exception(e)
+                except Exception as e:
+                    metrics["failed"] += 1
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    metrics["sent"] += 1
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    # Метрики для /metrics и админ-панели
+    def metrics(self) -> dict:
+        lanes = {}
+        for item, metrics in self._metrics.items():
+            processed = metrics["sent"] + metrics["failed"]
+            lanes[item.name.lower()] = {
+                "sent": metrics["sent"],
+                "failed": metrics["failed"],
+                "retried": metrics["retried"],
+                "wait_avg_ms": round(metrics["wait_total"] / processed * 1000, 2) if processed else 0.0,
+                "wait_max_ms": round(metrics["wait_max"] * 1000, 2),
+            }
+        return {
+            "queue_size": self._queue.qsize() + sum(len(held) for held in self._held.values()),
+            "retry_after_seconds": self._retry_after_seconds,
+            "lanes": lanes,
+        }
+
+    # Общая очередь и очереди чатов пусты
+    async def _drain(self):
+        while True:
+            await self._queue.join()
+            if not self._held:
+                return
+            await asyncio.sleep(0.05)
+
+    # Остановка: дожидаемся отправки очереди (не дольше timeout), затем останавливаем воркеров
+    async def stop(self, timeout: float = 10):
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._drain(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Не отправлено {self.metrics()['queue_size']} сообщений при остановке")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# Middleware сессии бота: все запросы, адресованные чату (send_*, edit_*, delete_message...),
+# проходят через планировщик. Обработчикам ничего менять не нужно — message.answer() и
+# bot.send_message() по-прежнему просто ожидаются.
+class OutboundMiddleware(BaseRequestMiddleware):
+    def __init__(self, scheduler: OutboundScheduler):
+        self.scheduler = scheduler
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        return await self.scheduler.send(lambda: make_request(bot, method), chat_id)
+
+
+# Общий планировщик исходящих сообщений бота
+outbound_scheduler = OutboundScheduler()
@@ -0,0 +1,84 @@
+# question_queue.py
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config.config import QUESTIONS_PAGE_SIZE, QUESTIONS_CACHE_PAGES
+from database import get_open_questions_page, count_open_questions
+from screens import Screen
+
+
+# Имя автора вопроса для списка: имя и фамилия, иначе @username, иначе User_<id>
+def user_display_name(user_id, first_name, last_name, username) -> str:
+    name = " ".join(part for part in (first_name, last_name) if part)
+    if name:
+        return name
+    if username:
+        return f"@{username}"
+    return f"User_{user_id}"
+
+
+# Очередь открытых вопросов для /questions: страницы по page_size вопросов,
+# переход вперёд/назад по курсору (id крайнего вопроса) в callback_data.
+# Готовые страницы кэшируются до изменения любого вопроса (invalidate):
+# номер версии защищает от записи в кэш страницы, собранной до изменения.
+class QuestionQueue:
+    def __init__(self, page_size: int = QUESTIONS_PAGE_SIZE, cache_pages: int = QUESTIONS_CACHE_PAGES):
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self.version = 0
+        self._pages = {}  # (after_id, before_id) -> Screen
+
+    # Вызывается при появлении нового вопроса и при ответе на вопрос
+    def invalidate(self):
+        self.version += 1
+        self._pages.clear()
+
+    async def page(self, db, after_id: int = None, before_id: int = None) -> Screen:
+        key = (after_id, before_id)
+        screen = self._pages.get(key)
+        if screen is not None:
+            return screen
+
+        version = self.version
+        rows, has_more = await get_open_questions_page(db, after_id, before_id, self.page_size)
+        if not rows and key != (None, None):
+            # Вопросы по курсору успели закрыть — показываем начало очереди
+            return await self.page(db)
+        total = await count_open_questions(db) if rows else 0
+        screen = self._render(rows, total, after_id, before_id, has_more)
+
+        if version == self.version:
+            if len(self._pages) >= self.cache_pages:
+                self._pages.clear()
+            self._pages[key] = screen
+        return screen
+
+    @staticmethod
+    def _render(rows, total, after_id, before_id, has_more) -> Screen:
+        if not rows:
+            return Screen("Нет активных вопросов.")
+
+        lines = [f"📋 Активные вопросы ({total}):\n"]
+        keyboard = []
+        for question_id, user_id, question, first_name, last_name, username in rows:
+            user_name = user_display_name(user_id, first_name, last_name, username)
+            preview = question or ""
+            if len(preview) > 50:
+                preview = preview[:50] + "..."
+            lines.append(f"👤 {user_name} (ID: {user_id}, Question ID: {question_id}): {preview}")
+            keyboard.append([InlineKeyboardButton(text=f"Ответить {user_name}", callback_data=f"answer_{question_id}")])
+
+        # Назад — если открыта не первая страница, вперёд — если после неё есть вопросы
+        has_prev = has_more if before_id is not None else after_id is not None
+        has_next = has_more if before_id is None else True
+        navigation = []
+        if has_prev:
+            navigation.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"questions_before_{rows[0][0]}"))
+        if has_next:
+            navigation.append(InlineKeyboardButton(text="Вперёд ➡️", callback_data=f"questions_after_{rows[-1][0]}"))
+        if navigation:
+            keyboard.append(navigation)
+
+        return Screen("\n".join(lines), InlineKeyboardMarkup(inline_keyboard=keyboard))
+
+
+question_queue = QuestionQueue()
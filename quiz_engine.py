@@ -0,0 +1,91 @@
+# quiz_engine.py
+import json
+from bisect import bisect_left
+from typing import NamedTuple
+
+from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
+
+from config.config import QUIZ_FILE
+from screens import Screen, REMOVE_KEYBOARD
+
+
+# Шаг теста: один вопрос и переход к следующему
+class Step(NamedTuple):
+    index: int  # Номер вопроса (с 0), сохраняется в quiz_answers.question
+    state: str  # Состояние FSM на этом вопросе
+    screen: Screen  # Текст вопроса и клавиатура с вариантами
+    options: dict  # Код варианта ("а", "б", ...) -> (номер варианта, баллы)
+    next_state: str  # Состояние следующего вопроса, None — последний вопрос
+
+
+# Риск-профиль по итогам теста
+class Profile(NamedTuple):
+    strategy_type: str
+    screen: Screen
+
+
+# Тест, собранный из описания (quiz/*.json): таблица переходов по состоянию FSM,
+# готовые экраны и пороги баллов. Всё вычисляется один раз при загрузке,
+# обработчику на ответ остаются поиск в словаре и bisect по порогам.
+class Quiz:
+    def __init__(self, definition: dict):
+        self.id = definition["id"]
+        self.version = definition["version"]
+
+        # Группа состояний FSM; для risk_profile — "Test", как у прежних Test.Q1..Q7,
+        # чтобы пользователи посреди теста продолжили его после обновления
+        group = definition.get("state_group", self.id)
+        questions = definition["questions"]
+        if not questions:
+            raise ValueError(f"В тесте {self.id} нет вопросов")
+        states = [f"{group}:{question['id']}" for question in questions]
+        if len(set(states)) != len(states):
+            raise ValueError(f"В тесте {self.id} повторяются id вопросов")
+
+        self.steps = {}
+        for index, question in enumerate(questions):
+            keyboard = ReplyKeyboardMarkup(
+                keyboard=[[KeyboardButton(text=option["text"])] for option in question["options"]],
+                resize_keyboard=True
+            )
+            self.steps[states[index]] = Step(
+                index=index,
+                state=states[index],
+                screen=Screen(question["text"], keyboard),
+                options={
+                    option["code"].lower(): (number, option["score"])
+                    for number, option in enumerate(question["options"])
+                },
+                next_state=states[index + 1] if index + 1 < len(states) else None,
+            )
+        self.first_step = self.steps[states[0]]
+
+        # Профили по возрастанию max_score, у последнего порога нет
+        profiles = definition["profiles"]
+        self._thresholds = [profile["max_score"] for profile in profiles[:-1]]
+        if self._thresholds != sorted(self._thresholds) or "max_score" in profiles[-1]:
+            raise ValueError(f"Пороги профилей теста {self.id} должны возрастать, у последнего профиля порога нет")
+        self._profiles = [
+            Profile(
+                profile["strategy_type"],
+                Screen(f"✅ *Тест завершён!* Вот твой результат:\n\n{profile['text']}", REMOVE_KEYBOARD),
+            )
+            for profile in profiles
+        ]
+        self.strategy_types = tuple(profile.strategy_type for profile in self._profiles)
+
+    # Вариант ответа по тексту сообщения (по первой букве). None — ответ не из списка
+    def option(self, step: Step, text: str):
+        return step.options.get(text[:1].lower())
+
+    def profile(self, score: int) -> Profile:
+        return self._profiles[bisect_left(self._thresholds, score)]
+
+
+def load_quiz(path: str = QUIZ_FILE) -> Quiz:
+    with open(path, encoding="utf-8") as f:
+        return Quiz(json.load(f))
+
+
+# Тест на риск-профиль
+quiz = load_quiz()
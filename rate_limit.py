@@ -0,0 +1,139 @@
+# rate_limit.py
+import time
+import asyncio
+from collections import OrderedDict
+
+
+# Асинхронный token bucket: не больше `rate` операций в секунду в среднем,
+# всплеск до `capacity`. pause() останавливает выдачу токенов целиком —
+# так обрабатывается TelegramRetryAfter, который относится ко всему боту.
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    # Взять токен без ожидания: 0 — токен взят, иначе сколько секунд ждать следующего
+    def try_acquire(self) -> float:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+# Набор token bucket по ключу (например, по chat_id) с вытеснением давно
+# неиспользуемых ключей, чтобы словарь не рос вместе с числом чатов.
+class KeyedTokenBuckets:
+    def __init__(self, rate: float, capacity: float = None, max_keys: int = 10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def get(self, key) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Ограничение числа событий по ключу (например, по user_id) в скользящем окне.
+# Вместо списка отметок времени на ключ хранится кортеж (номер окна, счётчик текущего окна,
+# счётчик предыдущего): оценка — предыдущий счётчик с весом оставшейся доли окна плюс текущий.
+# Ключи лежат в порядке последнего обращения; лишние сверх max_keys вытесняются сразу,
+# устаревшие — при переходе к новому окну.
+class SlidingWindowLimiter:
+    def __init__(self, limit: int, window: float, max_keys: int = 100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._index = None  # Окно, в котором последний раз снимались устаревшие ключи
+
+    # Учесть событие; False — лимит исчерпан (отклонённые события не считаются)
+    def hit(self, key, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        index = int(now // self.window)
+        entry = self._counters.pop(key, None)
+        if entry is None or entry[0] < index - 1:
+            current, previous = 0, 0
+        elif entry[0] == index - 1:
+            current, previous = 0, entry[1]
+        else:
+            current, previous = entry[1], entry[2]
+
+        elapsed = now / self.window - index
+        allowed = previous * (1 - elapsed) + current < self.limit
+        if allowed:
+            current += 1
+        self._counters[key] = (index, current, previous)
+
+        if len(self._counters) > self.max_keys:
+            self._counters.popitem(last=False)
+        if index != self._index:
+            # Новое окно: снимаем с начала ключи, не обращавшиеся два окна и дольше
+            self._index = index
+            while self._counters and next(iter(self._counters.values()))[0] < index - 1:
+                self._counters.popitem(last=False)
+        return allowed
+
+    def __len__(self):
+        return len(self._counters)
+
+
+# Множество ключей с общим временем жизни (ключи идемпотентности и т.п.).
+# Время жизни одинаковое, поэтому порядок добавления совпадает с порядком истечения:
+# просроченные ключи снимаются с начала словаря при каждом add().
+class ExpiringKeys:
+    def __init__(self, ttl: float, max_keys: int = 100000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._expires = OrderedDict()  # ключ -> момент истечения
+
+    # Добавить ключ; False — ключ уже есть и ещё не истёк
+    def add(self, key, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        while self._expires and next(iter(self._expires.values())) <= now:
+            self._expires.popitem(last=False)
+        if key in self._expires:
+            return False
+        self._expires[key] = now + self.ttl
+        if len(self._expires) > self.max_keys:
+            self._expires.popitem(last=False)
+        return True
+
+    def __len__(self):
+        return len(self._expires)
@@ -0,0 +1,45 @@
+# screens.py
+from typing import NamedTuple
+
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardRemove,
+)
+
+from consent_store import POLICY, OFFER
+
+
+# Готовые экраны бота: текст и клавиатура собираются один раз при импорте
+# (экраны вопросов и результатов теста собирает quiz_engine).
+# Объекты общие для всех пользователей — изменять их в обработчиках нельзя.
+class Screen(NamedTuple):
+    text: str
+    reply_markup: object = None
+
+
+# === Экран согласия: 4 варианта отметок ===
+def _policy_keyboard(flags: int) -> InlineKeyboardMarkup:
+    policy_text = "✅ Политика конфиденциальности" if flags & POLICY else "☐ Политика конфиденциальности"
+    offer_text = "✅ Публичная оферта" if flags & OFFER else "☐ Публичная оферта"
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=policy_text, callback_data="accept_policy")],
+        [InlineKeyboardButton(text=offer_text, callback_data="accept_offer")],
+        [InlineKeyboardButton(text="Принять", callback_data="accept")]
+    ])
+
+
+POLICY_KEYBOARDS = tuple(_policy_keyboard(flags) for flags in range((POLICY | OFFER) + 1))
+
+
+def policy_keyboard(flags: int = 0) -> InlineKeyboardMarkup:
+    return POLICY_KEYBOARDS[flags]
+
+
+# Убрать клавиатуру с ответами после теста
+REMOVE_KEYBOARD = ReplyKeyboardRemove()
+
+
+# Кнопки после результата: скачать гайд + пройти заново
+NEXT_ACTIONS_SCREEN = Screen("Что хочешь сделать дальше?", InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="📘 Скачать гайд", callback_data="download_guide")],
+    [InlineKeyboardButton(text="🔁 Пройти тест заново", callback_data="restart_test")]
+]))
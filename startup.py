@@ -0,0 +1,124 @@
+# startup.py
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject
+from sqlalchemy import text
+
+from config.config import DB_CONNECT_ATTEMPTS, DB_CONNECT_BASE_DELAY, DB_CONNECT_MAX_DELAY, DB_POOL_WARM
+from config.setup_commands import sync_bot_commands
+from database import engine, async_session, run_migrations, ensure_bot_counters
+
+
+logger = logging.getLogger(__name__)
+
+# Момент запуска процесса — от него считается время до первого апдейта
+PROCESS_STARTED = time.monotonic()
+
+
+# Замер длительности фаз запуска
+class StartupTimer:
+    def __init__(self):
+        self.phases = {}
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.monotonic() - started
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.phases.items())
+
+
+# Ожидание готовности БД с экспоненциальной паузой между попытками (вместо фиксированного sleep)
+async def wait_for_database(attempts: int = DB_CONNECT_ATTEMPTS, base_delay: float = DB_CONNECT_BASE_DELAY, max_delay: float = DB_CONNECT_MAX_DELAY):
+    delay = base_delay
+    for attempt in range(1, attempts + 1):
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return attempt
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            logger.warning(f"База данных недоступна (попытка {attempt}/{attempts}): {e}. Повтор через {delay:.2f} с")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+# Прогрев пула: заранее открываем несколько соединений, чтобы первые апдейты их не ждали
+async def warm_pool(size: int = DB_POOL_WARM):
+    async def touch():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(touch() for _ in range(size)))
+
+
+# Подготовка БД: миграции, счётчики статистики, прогрев пула
+async def prepare_database(timer: StartupTimer):
+    async with timer.phase("миграции"):
+        await run_migrations()
+    async with timer.phase("счётчики"):
+        async with async_session() as db:
+            await ensure_bot_counters(db)
+    async with timer.phase("прогрев пула"):
+        await warm_pool()
+
+
+# Команды в меню не нужны для обработки апдейтов: ошибку Bot API только логируем
+async def register_commands(bot, timer: StartupTimer):
+    async with timer.phase("команды бота"):
+        try:
+            await sync_bot_commands(bot)
+        except TelegramAPIError as e:
+            logger.error(f"Не удалось обновить команды бота: {e}")
+
+
+# Последовательность запуска: проверка БД, затем параллельно подготовка БД и запросы к Bot API
+async def run_startup(bot) -> StartupTimer:
+    timer = StartupTimer()
+
+    async with timer.phase("ожидание БД"):
+        await wait_for_database()
+
+    async with timer.phase("подготовка (всего)"):
+        # return_exceptions: сбой одной фазы не бросает другую недовыполненной посреди запуска
+        database_result, commands_result = await asyncio.gather(
+            prepare_database(timer), register_commands(bot, timer), return_exceptions=True
+        )
+    if isinstance(commands_result, Exception):
+        logger.error(f"Не удалось обновить команды бота: {commands_result}")
+    # Без подготовленной БД бот работать не может
+    if isinstance(database_result, BaseException):
+        raise database_result
+
+    logger.info(
+        f"Запуск за {(time.monotonic() - PROCESS_STARTED) * 1000:.0f} мс от старта процесса: {timer.summary()}"
+    )
+    return timer
+
+
+# Outer-middleware, которое один раз логирует время от старта процесса до первого апдейта
+class FirstUpdateTimerMiddleware(BaseMiddleware):
+    def __init__(self):
+        self.first_update_at = None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self.first_update_at is None:
+            self.first_update_at = time.monotonic() - PROCESS_STARTED
+            logger.info(f"Первый апдейт через {self.first_update_at * 1000:.0f} мс после старта процесса")
+        return await handler(event, data)
@@ -0,0 +1,73 @@
+# throttling.py
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config.config import THROTTLE_LIMIT, THROTTLE_WINDOW, CALLBACK_DEDUP_WINDOW, THROTTLE_MAX_USERS
+from rate_limit import SlidingWindowLimiter, ExpiringKeys
+
+
+logger = logging.getLogger(__name__)
+
+
+# Outer-middleware на апдейты: защита обработчиков от флуда.
+# 1. Повторное нажатие той же кнопки в том же сообщении за dedup_window секунд
+#    (двойной тап по «Скачать гайд», дребезг галочек согласия) — обработчик не вызывается,
+#    callback только подтверждается, чтобы у пользователя погасли «часики».
+# 2. Больше limit апдейтов от пользователя за скользящее окно window — апдейт отбрасывается
+#    (на нажатие кнопки — короткая подсказка).
+# Состояние — компактные словари с вытеснением (rate_limit), размер не превышает max_users.
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(
+        self,
+        limit: int = THROTTLE_LIMIT,
+        window: float = THROTTLE_WINDOW,
+        dedup_window: float = CALLBACK_DEDUP_WINDOW,
+        max_users: int = THROTTLE_MAX_USERS,
+    ):
+        self.limiter = SlidingWindowLimiter(limit, window, max_users)
+        self.callback_keys = ExpiringKeys(dedup_window, max_users)
+        self.dropped = 0  # Отброшено по лимиту
+        self.duplicates = 0  # Повторных нажатий без вызова обработчика
+
+    def metrics(self) -> dict:
+        return {
+            "users": len(self.limiter),
+            "callback_keys": len(self.callback_keys),
+            "dropped": self.dropped,
+            "duplicates": self.duplicates,
+        }
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or not isinstance(event, Update):
+            return await handler(event, data)
+
+        callback = event.callback_query
+        if callback is not None:
+            message_id = callback.message.message_id if callback.message else callback.inline_message_id
+            # Ключ идемпотентности: пользователь + сообщение + кнопка (хэш вместо кортежа — меньше памяти)
+            if not self.callback_keys.add(hash((user.id, message_id, callback.data))):
+                self.duplicates += 1
+                await data["bot"].answer_callback_query(callback.id)
+                return None
+
+        if not self.limiter.hit(user.id):
+            self.dropped += 1
+            logger.debug(f"Пользователь {user.id} превысил лимит апдейтов, апдейт {event.update_id} отброшен")
+            if callback is not None:
+                await data["bot"].answer_callback_query(callback.id, text="Слишком много нажатий, подождите немного.")
+            return None
+
+        return await handler(event, data)
+
+
+# Общий экземпляр (счётчики отдаются в /metrics)
+throttling_middleware = ThrottlingMiddleware()
@@ -0,0 +1,167 @@
+# user_cache.py
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from config.config import USER_CACHE_SIZE, USER_CACHE_TTL
+
+
+logger = logging.getLogger(__name__)
+
+# Ключ в session.info: изменения записей пользователей, сделанные в незакоммиченной транзакции
+SESSION_KEY = "user_cache_dirty"
+
+
+# Кэш строк users перед базой: user_id -> (момент истечения, снимок строки).
+# Снимок — неизменяемый NamedTuple (database.UserSnapshot), его можно отдавать обработчикам.
+# - get(): чтение через кэш; одновременные промахи по одному user_id ждут одну загрузку (single-flight)
+# - stage(): хелперы записи в database.py откладывают изменения снимка в сессии транзакции;
+#   в общий кэш они попадают только после коммита (commit_tracked), при откате отбрасываются
+#   (discard_tracked). Пока транзакция открыта, другие апдейты видят закоммиченный снимок,
+#   а проверки «значение не изменилось» по этому пользователю не срабатывают (peek_for)
+# - update(): изменение уже закоммиченных полей, без перечитывания
+# Размер ограничен max_size (вытесняется давно не использованный), записи живут ttl секунд —
+# это страховка от изменений в обход хелперов (ручные правки базы, другой процесс).
+class UserCache:
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._loading = {}  # user_id -> Future загрузки
+        self._version = 0  # Меняется при каждом изменении, загрузка по устаревшей версии не кэшируется
+        self._writers = {}  # user_id -> число открытых транзакций с отложенными изменениями
+        self.hits = 0
+        self.misses = 0
+
+    # Снимок из кэша без обращения к базе (None — нет или истёк)
+    def peek(self, user_id: int):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, snapshot = entry
+        if expires <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return snapshot
+
+    def put(self, user_id: int, snapshot):
+        self._version += 1
+        self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    # Снимок для проверки «значение не изменилось» внутри транзакции сессии db: закоммиченный
+    # снимок с изменениями этой транзакции. None — если записи нет или пользователя сейчас
+    # меняет другая открытая транзакция (её итог ещё неизвестен, нужен запрос к базе)
+    def peek_for(self, db, user_id: int):
+        staged = db.info.get(SESSION_KEY, {}).get(user_id)
+        if self._writers.get(user_id, 0) > (staged is not None):
+            return None
+        if staged is None:
+            return self.peek(user_id)
+        snapshot, values = staged
+        if snapshot is None:
+            snapshot = self.peek(user_id)
+        return snapshot._replace(**values) if snapshot is not None else None
+
+    # Чтение через кэш: load() — корутина-функция, возвращающая снимок или None
+    async def get(self, user_id: int, load):
+        snapshot = self.peek(user_id)
+        if snapshot is not None:
+            return snapshot
+
+        future = self._loading.get(user_id)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        version = self._version
+        future = self._loading[user_id] = asyncio.get_running_loop().create_future()
+        try:
+            snapshot = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Ожидающих может не быть — помечаем исключение как полученное
+            raise
+        finally:
+            del self._loading[user_id]
+
+        if snapshot is not None and version == self._version:
+            self.put(user_id, snapshot)
+        future.set_result(snapshot)
+        return snapshot
+
+    # Изменить поля закэшированного снимка (если пользователя нет в кэше — ничего не делать)
+    def update(self, user_id: int, **values):
+        self._version += 1
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self._entries[user_id] = (entry[0], entry[1]._replace(**values))
+
+    def invalidate(self, user_id: int):
+        self._version += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._version += 1
+        self._entries.clear()
+
+    # Отложить изменение записи пользователя до коммита транзакции сессии db:
+    # snapshot — новый снимок целиком (новая строка или перечитанная), values — изменённые поля
+    def stage(self, db, user_id: int, snapshot=None, **values):
+        staged = db.info.setdefault(SESSION_KEY, {})
+        if user_id not in staged:
+            self._writers[user_id] = self._writers.get(user_id, 0) + 1
+            staged[user_id] = (snapshot, values)
+        elif snapshot is not None:
+            staged[user_id] = (snapshot, values)
+        else:
+            staged[user_id] = (staged[user_id][0], {**staged[user_id][1], **values})
+
+    # Есть ли у транзакции сессии db отложенные изменения пользователя
+    def is_staged(self, db, user_id: int) -> bool:
+        return user_id in db.info.get(SESSION_KEY, ())
+
+    def _release(self, user_ids):
+        for user_id in user_ids:
+            writers = self._writers.pop(user_id, 1) - 1
+            if writers > 0:
+                self._writers[user_id] = writers
+
+    # Транзакция закоммичена: публикуем её изменения в общий кэш
+    def commit_tracked(self, db):
+        staged = db.info.pop(SESSION_KEY, {})
+        self._release(staged)
+        for user_id, (snapshot, values) in staged.items():
+            if snapshot is not None:
+                self.put(user_id, snapshot._replace(**values))
+            else:
+                self.update(user_id, **values)
+
+    # Транзакция откатилась: её изменения отбрасываются. Записи этих пользователей
+    # удаляются из кэша — часть изменений могла попасть в базу промежуточным коммитом
+    def discard_tracked(self, db):
+        staged = db.info.pop(SESSION_KEY, {})
+        self._release(staged)
+        for user_id in staged:
+            self.invalidate(user_id)
+        if staged:
+            logger.debug(f"Откат транзакции: из кэша удалено пользователей: {len(staged)}")
+
+    def metrics(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Общий экземпляр кэша пользователей
+user_cache = UserCache()
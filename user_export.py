@@ -0,0 +1,91 @@
+# user_export.py
+import os
+import csv
+import gzip
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import Boolean, DateTime
+
+from config.config import DATA_DIR, EXPORT_BATCH_SIZE, EXPORT_COMPRESS_LEVEL
+from database import EXPORT_COLUMNS, stream_users
+
+
+# Одна выгрузка за раз: полный проход по users — тяжёлый запрос
+export_lock = asyncio.Lock()
+
+
+# Разбор аргументов /export: тип стратегии и/или даты ГГГГ-ММ-ДД (с какого и по какой день включительно).
+# Возвращает фильтры для export_users, при ошибке — ValueError
+def parse_export_args(args: str, strategy_types: tuple) -> dict:
+    filters = {}
+    dates = []
+    for token in (args or "").split():
+        try:
+            dates.append(datetime.strptime(token, "%Y-%m-%d"))
+            continue
+        except ValueError:
+            pass
+        matches = [strategy for strategy in strategy_types if strategy.lower() == token.lower()]
+        if not matches or "strategy_type" in filters:
+            raise ValueError(token)
+        filters["strategy_type"] = matches[0]
+
+    if len(dates) > 2:
+        raise ValueError(args)
+    if dates:
+        filters["date_from"] = dates[0]
+    if len(dates) == 2:
+        filters["date_to"] = dates[1] + timedelta(days=1)
+    return filters
+
+
+# Номера колонок с датами и флагами: даты пишутся без микросекунд, флаги — 0/1
+DATETIME_COLUMNS = [i for i, column in enumerate(EXPORT_COLUMNS) if isinstance(column.type, DateTime)]
+BOOLEAN_COLUMNS = [i for i, column in enumerate(EXPORT_COLUMNS) if isinstance(column.type, Boolean)]
+
+
+def _write_rows(writer, rows):
+    formatted = []
+    for row in rows:
+        row = list(row)
+        for i in DATETIME_COLUMNS:
+            if row[i] is not None:
+                row[i] = row[i].isoformat(" ", "seconds")
+        for i in BOOLEAN_COLUMNS:
+            if row[i] is not None:
+                row[i] = int(row[i])
+        formatted.append(row)
+    writer.writerows(formatted)
+
+
+# Выгрузка пользователей в сжатый CSV (gzip) во временный файл в DATA_DIR.
+# Строки читаются из базы пачками (stream_users), каждая пачка форматируется и сжимается
+# в отдельном потоке — в памяти не больше двух пачек, event loop не блокируется.
+# Возвращает (путь к файлу, число строк); файл удаляет вызывающий.
+async def export_users(db, strategy_type: str = None, date_from: datetime = None, date_to: datetime = None, batch_size: int = EXPORT_BATCH_SIZE):
+    fd, path = tempfile.mkstemp(prefix="users_", suffix=".csv.gz", dir=DATA_DIR)
+    total = 0
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", compresslevel=EXPORT_COMPRESS_LEVEL, encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([column.key for column in EXPORT_COLUMNS])
+            # Запись пачки в потоке идёт параллельно с чтением следующей из базы
+            writing = None
+            try:
+                async for rows in stream_users(db, strategy_type, date_from, date_to, batch_size):
+                    if writing is not None:
+                        await writing
+                    writing = asyncio.ensure_future(asyncio.to_thread(_write_rows, writer, rows))
+                    total += len(rows)
+                if writing is not None:
+                    await writing
+            finally:
+                # При ошибке файл закрывается только после того, как поток дописал свою пачку
+                if writing is not None and not writing.done():
+                    await asyncio.gather(writing, return_exceptions=True)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, total
@@ -0,0 +1,105 @@
+# webhook.py
+import hmac
+import time
+import asyncio
+import logging
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from outbound import outbound_scheduler
+from throttling import throttling_middleware
+from user_cache import user_cache
+from database import engine
+from db_pool import pool_status
+from config.config import WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEB_SERVER_HOST, WEB_SERVER_PORT, METRICS_TOKEN
+
+
+logger = logging.getLogger(__name__)
+
+started_at = time.monotonic()
+
+
+# === Health-check ===
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({
+        "status": "ok",
+        "uptime": round(time.monotonic() - started_at, 1),
+    })
+
+
+# === Метрики ===
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+
+# Метрики раскрывают внутреннее состояние бота: с токеном METRICS_TOKEN нужен заголовок
+# Authorization: Bearer <токен>, без токена отвечаем только на запросы с localhost
+def metrics_allowed(request: web.Request, token: str = METRICS_TOKEN) -> bool:
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode())
+    return request.remote in LOCAL_ADDRESSES
+
+
+async def metrics(request: web.Request) -> web.Response:
+    if not metrics_allowed(request):
+        raise web.HTTPForbidden()
+    return web.json_response({
+        "outbound": outbound_scheduler.metrics(),
+        "throttling": throttling_middleware.metrics(),
+        "user_cache": user_cache.metrics(),
+        "db_pool": pool_status(engine),
+    })
+
+
+# Создание aiohttp-приложения: приём апдейтов от Telegram, /health и /metrics.
+# Апдейт передаётся диспетчеру в фоне (handle_in_background), поэтому Telegram
+# получает ответ 200 сразу, не дожидаясь обработчиков.
+def create_app(dp: Dispatcher, bot: Bot, secret_token: str = WEBHOOK_SECRET, path: str = WEBHOOK_PATH) -> web.Application:
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=secret_token,
+    ).register(app, path=path)
+
+    # Связываем startup/shutdown диспетчера с жизненным циклом приложения
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+# Регистрация вебхука в Telegram при старте (вызывается диспетчером)
+async def set_webhook(bot: Bot, dispatcher: Dispatcher):
+    await bot.set_webhook(
+        url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+    )
+    logger.info(f"Вебхук установлен: {WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+
+# Запуск бота в режиме webhook до остановки процесса
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    if not WEBHOOK_BASE_URL:
+        raise RuntimeError("Для BOT_MODE=webhook нужно задать WEBHOOK_BASE_URL")
+    # Без секрета любой, кто знает адрес, может присылать боту поддельные апдейты
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("Для BOT_MODE=webhook нужно задать WEBHOOK_SECRET")
+
+    dp.startup.register(set_webhook)
+    app = create_app(dp, bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEB_SERVER_HOST, port=WEB_SERVER_PORT)
+    await site.start()
+    logger.info(f"Webhook-сервер слушает {WEB_SERVER_HOST}:{WEB_SERVER_PORT}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
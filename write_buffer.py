@@ -0,0 +1,84 @@
+# write_buffer.py
+import asyncio
+import logging
+
+from database import get_db
+
+
+logger = logging.getLogger(__name__)
+
+
+# Буфер отложенной записи: обработчики только кладут данные в память, накопленное
+# записывается в базу одним пакетом по таймеру или при достижении порога.
+# Подкласс задаёт, как хранится пакет (_new_pending), как он пишется (_write)
+# и как возвращается в буфер после ошибки записи (_restore).
+class WriteBehindBuffer:
+    name = "записей"  # Что пишет буфер, в родительном падеже — для логов
+
+    def __init__(self, flush_interval: float, flush_threshold: int):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending = self._new_pending()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def _new_pending(self):
+        raise NotImplementedError
+
+    async def _write(self, db, batch):
+        raise NotImplementedError
+
+    def _restore(self, batch):
+        raise NotImplementedError
+
+    # Вызывается подклассом после добавления в _pending: при достижении порога будим сброс
+    def _added(self):
+        if len(self._pending) >= self.flush_threshold:
+            self._wakeup.set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    # Записать накопленное в базу данных
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, self._new_pending()
+            try:
+                async for db in get_db():
+                    await self._write(db, batch)
+            except Exception as e:
+                self._restore(batch)
+                logger.error(f"Ошибка записи {self.name} ({len(batch)} шт.): {e}")
+                return 0
+
+            logger.debug(f"Записано {self.name}: {len(batch)}")
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    # Запуск фоновой задачи сброса (вызывается при старте диспетчера)
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    # Остановка с финальным сбросом буфера (вызывается при остановке диспетчера)
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()